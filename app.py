@@ -1,403 +1,896 @@
-# app.py
-from unicodedata import name
-from flask import Flask, render_template, Response, jsonify, g, request, redirect, url_for, flash, send_file,send_from_directory
-import cv2
-import numpy as np
-from attendance_system import load_known_faces, mark_attendance_batch
-from database import FaceDatabase
-import threading
-import face_recognition
-import logging
-from datetime import datetime, timedelta, date
-from functools import lru_cache
-import time
-from logging.handlers import RotatingFileHandler
-import sqlite3
-import excel_manager
-
-# Initialize Flask app
-app = Flask(__name__)
-camera = cv2.VideoCapture(0)
-app.config.update({
-    'VIDEO_SOURCE': 0,
-    'FACE_TOLERANCE': 0.55,
-    'CACHE_TIMEOUT_MINUTES': 5,
-    'FRAME_SKIP_RATE': 2,  # Process every Nth frame
-    'SECRET_KEY': 'your_secret_key_here'
-})
-
-# Logging
-handler = RotatingFileHandler('app.log', maxBytes=5*1024*1024, backupCount=2)
-handler.setLevel(logging.INFO)
-formatter = logging.Formatter('%(asctime)s [%(levelname)s] %(message)s')
-handler.setFormatter(formatter)
-app.logger.addHandler(handler)
-app.logger.setLevel(logging.INFO)
-
-# Global variables
-current_frame = None
-processing_lock = threading.Lock()
-last_cache_clear = datetime.now()
-
-# Ensure excel files exist
-excel_manager.init_excel_files()
-
-marked_today = set()
-last_marked_date = date.today()
-
-# Database connection helpers (reuse your FaceDatabase wrapper)
-def get_db():
-    if 'db' not in g:
-        g.db = FaceDatabase()
-        try:
-            g.db._create_tables()
-        except Exception as e:
-            app.logger.error(f"Table creation failed: {str(e)}")
-    return g.db
-
-
-
-@app.teardown_appcontext
-def close_db(e=None):
-    db = g.pop('db', None)
-    if db is not None:
-        db.close()
-
-# Caching known faces with LRU
-@lru_cache(maxsize=1)
-def get_cached_known_faces():
-    app.logger.info("Loading known faces from database")
-    return load_known_faces()
-
-def clear_face_cache():
-    global last_cache_clear
-    now = datetime.now()
-    if now - last_cache_clear > timedelta(minutes=app.config['CACHE_TIMEOUT_MINUTES']):
-        get_cached_known_faces.cache_clear()
-        last_cache_clear = now
-        app.logger.info("Cleared face recognition cache")
-
-
-
-# Video feed generator (yields MJPEG)
-def generate_frames():
-    global current_frame
-    try:
-        cap = cv2.VideoCapture(app.config['VIDEO_SOURCE'],cv2.CAP_DSHOW)
-        if not cap.isOpened():
-            raise RuntimeError("Could not open camera")
-    except Exception as e:
-        app.logger.error(f"Camera initialization failed: {str(e)}")
-        return
-
-    frame_counter = 0
-    try:
-        while True:
-            reset_marked_today_if_new_day()  # 🧹 Reset daily marked cache
-
-            success, frame = cap.read()
-            frame_counter += 1
-            if not success:
-                app.logger.warning("Frame capture failed")
-                break
-
-            # Frame skipping
-            if frame_counter % app.config['FRAME_SKIP_RATE'] != 0:
-                continue
-
-            # Resize for faster face processing
-            small = cv2.resize(frame, (0, 0), fx=0.25, fy=0.25)
-            rgb_small = cv2.cvtColor(small, cv2.COLOR_BGR2RGB)
-
-            # Face detection + encodings
-            face_locations = face_recognition.face_locations(rgb_small)
-            face_encodings = face_recognition.face_encodings(rgb_small, face_locations)
-
-            # Use lock for current_frame and recognition
-            with processing_lock:
-                current_frame = frame.copy()
-                known_encodings, known_names, user_ids = get_cached_known_faces()
-
-                # If there are known encodings, compare
-                if known_encodings:
-                    matches_to_mark = []
-                    for (top, right, bottom, left), face_encoding in zip(face_locations, face_encodings):
-                        # distances against DB
-                        face_distances = face_recognition.face_distance(known_encodings, face_encoding)
-                        if len(face_distances) == 0:
-                            continue
-                        best_idx = np.argmin(face_distances)
-                        best_distance = float(face_distances[best_idx])
-                        is_match = best_distance < app.config['FACE_TOLERANCE']
-                        name_to_show = "Unknown"
-                        color = (0, 0, 255)
-                        if is_match:
-                            # ✅ Recognized
-                            uid = user_ids[best_idx]
-                            name = known_names[best_idx]
-                            name_to_show = f"{name} ({1.0 - best_distance:.2f})"
-                            color = (0, 255, 0)
-
-                            # 🤖 Auto-mark attendance if not already marked
-                            if uid not in marked_today:
-                                matches_to_mark.append((uid, name))
-                                
-
-                        # scale back to full frame and draw
-                        top *= 4; right *= 4; bottom *= 4; left *= 4
-                        cv2.rectangle(frame, (left, top), (right, bottom), color, 2)
-                        cv2.putText(frame, name_to_show, (left+6, bottom-6),
-                                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255,255,255), 1)
-                    if matches_to_mark:
-                        app.logger.info(f"🤖 Auto marking attendance for {len(matches_to_mark)} face(s): {matches_to_mark}")
-                        mark_attendance_batch(matches_to_mark)
-                        for uid, _ in matches_to_mark:
-                            marked_today.add(uid)  
-
-            # yield MJPEG frame
-            ret, buffer = cv2.imencode('.jpg', frame)
-            frame_bytes = buffer.tobytes()
-            yield (b'--frame\r\n'
-                   b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-    finally:
-        try:
-            cap.release()
-        except Exception:
-            pass
-        app.logger.info("Camera resource released")
-
-def reset_marked_today_if_new_day():
-    global marked_today, last_marked_date
-    today = date.today()
-    if today != last_marked_date:
-        marked_today.clear()
-        last_marked_date = today
-        app.logger.info("🧹 Cleared marked_today set for new day")
-
-
-# Routes
-# ⬇️ Replace your existing index() route
-@app.route('/')
-def index():
-    return send_from_directory('static', 'index.html')
-
-
-@app.route('/video_feed')
-def video_feed():
-    clear_face_cache()
-    return Response(generate_frames(), mimetype='multipart/x-mixed-replace; boundary=frame')
-
-@app.route('/mark_attendance', methods=['POST', 'GET'])
-def mark_attendance_endpoint():
-    """
-    Accepts a request to mark attendance from the current_frame.
-    Handles multiple faces in the frame and marks all recognized employees.
-    """
-    try:
-        clear_face_cache()
-
-        with processing_lock:
-            if current_frame is None:
-                app.logger.error("No frame available for attendance marking")
-                return jsonify({"status":"error","message":"Camera feed not available"}), 400
-
-            small_frame = cv2.resize(current_frame, (0,0), fx=0.25, fy=0.25)
-            rgb_small = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
-            face_locations = face_recognition.face_locations(rgb_small)
-            face_encodings = face_recognition.face_encodings(rgb_small, face_locations)
-
-            if not face_encodings:
-                app.logger.warning("No faces detected in frame")
-                return jsonify({"status":"error","message":"No face detected - please face the camera"}), 400
-
-            known_encodings, known_names, user_ids = get_cached_known_faces()
-            if not known_encodings:
-                app.logger.error("No registered faces in database")
-                return jsonify({"status":"error","message":"System has no registered users"}), 400
-
-            matches = []  # (user_id, name)
-            seen_user_ids = set()
-
-            for enc in face_encodings:
-                # compute distances to known faces
-                distances = face_recognition.face_distance(known_encodings, enc)
-                if len(distances) == 0:
-                    continue
-                best_idx = np.argmin(distances)
-                best_distance = float(distances[best_idx])
-                if best_distance < app.config['FACE_TOLERANCE']:
-                    uid = user_ids[best_idx]
-                    name = known_names[best_idx]
-                    if uid not in seen_user_ids:
-                        matches.append((uid, name))
-                        seen_user_ids.add(uid)
-
-            if not matches:
-                return jsonify({"status":"error","message":"Recognition confidence too low for all faces"}), 400
-
-            # Mark attendance for all matched users (returns dict)
-            results = mark_attendance_batch(matches)
-            response = {"status":"success","results":[]}
-            for uid, name in matches:
-                response["results"].append({
-                    "user_id": uid,
-                    "name": name,
-                    "result": results.get(uid, "error")
-                })
-
-            # After marking, produce absent CSV for today and include filename in response
-            try:
-                abs_file = excel_manager.write_daily_absentees(target_date=date.today().isoformat())
-                response["absentees_csv"] = abs_file
-            except Exception as e:
-                app.logger.error(f"Failed to write absentees CSV: {e}")
-
-            return jsonify(response)
-
-    except Exception as e:
-        app.logger.error(f"Unexpected error: {str(e)}")
-        return jsonify({"status":"error","message":"Internal server error"}), 500
-
-# ⬇️ Update register() to serve register.html on GET
-@app.route('/register', methods=['GET', 'POST'])
-def register():
-    if request.method == 'POST':
-        try:
-            name = request.form['name']
-            email = request.form.get('email')
-            salary = request.form.get('salary')  # optional
-            proxy = request.form.get('proxy')    # optional
-
-            if 'image' not in request.files:
-                return "No image uploaded", 400
-            image = request.files['image']
-            if image.filename == '':
-                return "No selected image", 400
-
-            # Extract face encoding
-            img = face_recognition.load_image_file(image)
-            encodings = face_recognition.face_encodings(img)
-            if not encodings:
-                return "No face found in image", 400
-
-            # Save to DB + Excel
-            db = get_db()
-            user_id = db.add_user(name, email, proxy=proxy, salary=salary)
-            db.add_face_encoding(user_id, encodings[0])
-            excel_manager.add_or_update_employee(user_id, name, email=email, proxy=proxy, salary=salary)
-
-            # Clear face cache for immediate recognition
-            get_cached_known_faces.cache_clear()
-
-            return jsonify({"status": "success", "user_id": user_id})
-
-        except Exception as e:
-            app.logger.error(f"Registration failed: {e}")
-            return f"Registration failed: {str(e)}", 500
-
-    # ✅ Serve static register.html on GET
-    return send_from_directory('static', 'register.html')
-
-# ⬇️ New clean attendance page route
-@app.route('/attendance')
-def view_attendance():
-    return send_from_directory('static', 'attendance.html')
-
-# ⬇️ New clean users page route
-@app.route('/users')
-def view_users():
-    return send_from_directory('static', 'users.html')
-
-@app.route('/download_employees')
-def download_employees():
-    try:
-        return send_file('employees.xlsx', as_attachment=True)
-    except Exception as e:
-        app.logger.error(f"Failed to send employees.xlsx: {e}")
-        return "Error", 500
-
-@app.route('/download_attendance')
-def download_attendance():
-    try:
-        return send_file('attendance.xlsx', as_attachment=True)
-    except Exception as e:
-        app.logger.error(f"Failed to send attendance.xlsx: {e}")
-        return "Error", 500
-
-@app.route('/health')
-def health_check():
-    return jsonify({"status":"healthy", "timestamp": datetime.now().isoformat()})
-
-
-
-@app.route('/api/users')
-def api_users():
-    try:
-        db = get_db()
-        rows = db.list_users()   # returns list of dicts directly
-        users = []
-        for u in rows:
-            users.append({
-                "user_id": u.get("user_id"),
-                "name": u.get("name"),
-                "email": u.get("email"),
-                "proxy": u.get("proxy"),
-                "salary": u.get("salary")
-            })
-        return jsonify(users)
-    except Exception as e:
-        app.logger.error(f"API /api/users error: {e}")
-        return jsonify([]), 500
-
-
-
-@app.route('/api/attendance')
-def api_attendance():
-    try:
-        filter_type = request.args.get('filter_type', 'single')
-        selected_date = request.args.get('date')
-        start_date = request.args.get('start_date')
-        end_date = request.args.get('end_date')
-
-        with get_db()._get_conn() as conn:
-            cursor = conn.cursor()
-            query = '''
-                SELECT u.name, a.timestamp 
-                FROM attendance_records a
-                JOIN users u ON a.user_id = u.user_id
-            '''
-            params = []
-
-            # 🟢 Single date filter
-            if filter_type == 'single' and selected_date:
-                query += ' WHERE substr(a.timestamp,1,10) = ?'
-                params.append(selected_date)
-
-            # 🟡 Range filter
-            elif filter_type == 'range' and start_date and end_date:
-                query += ' WHERE substr(a.timestamp,1,10) BETWEEN ? AND ?'
-                params.extend([start_date, end_date])
-
-            query += ' ORDER BY a.timestamp DESC'
-            app.logger.info(f"Final attendance query: {query} with {params}")
-            cursor.execute(query, params)
-            rows = cursor.fetchall()
-
-
-        records = [
-            {
-                "name": r[0],
-                "timestamp": (r[1].isoformat() if hasattr(r[1], 'isoformat') else str(r[1]))
-            }
-            for r in rows
-        ]
-
-        return jsonify(records)
-
-    except Exception as e:
-        app.logger.exception("API /api/attendance error")
-        return jsonify({"error": str(e)}), 500
-
-
-if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True, threaded=True, use_reloader=False)
+# app.py
+from unicodedata import name
+from flask import Flask, render_template, Response, jsonify, g, request, redirect, url_for, flash, send_file,send_from_directory
+import cv2
+import numpy as np
+from attendance_system import load_known_faces, append_known_face, mark_attendance_batch
+from database import get_database
+import threading
+import queue
+import os
+import json
+import face_recognition
+import logging
+from datetime import datetime, timedelta, date
+from functools import lru_cache
+import time
+from logging.handlers import RotatingFileHandler
+import sqlite3
+import excel_manager
+import match
+
+# Persistent SIMD JPEG encoder: TurboJPEG keeps its DCT/Huffman state alive
+# across frames, unlike cv2.imencode which re-initializes libjpeg per call.
+try:
+    from turbojpeg import TurboJPEG, TJPF_BGR
+    _turbo_jpeg = TurboJPEG()
+except Exception:
+    _turbo_jpeg = None
+
+# orjson serializes 5-10x faster than Flask's stdlib json path
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Direct dlib access for the batched descriptor path (one forward pass for
+# all faces in a frame instead of N sequential ones).
+try:
+    import dlib
+    from face_recognition.api import face_encoder as _dlib_face_encoder
+    from face_recognition.api import pose_predictor_5_point as _dlib_pose_predictor
+    _dlib_detector = dlib.get_frontal_face_detector()
+except Exception:
+    dlib = None
+
+# Initialize Flask app
+app = Flask(__name__)
+camera = cv2.VideoCapture(0)
+app.config.update({
+    'VIDEO_SOURCE': 0,
+    'FACE_TOLERANCE': 0.55,
+    'CACHE_TIMEOUT_MINUTES': 5,
+    'FRAME_SKIP_RATE': 2,  # Initial skip; adapts to measured processing time
+    'CAMERA_FPS': 30,  # nominal capture rate, sets the adaptive-skip target
+    'STRIDED_DOWNSCALE': True,  # 4:1 decimation via slicing instead of cv2.resize
+    'MOTION_GATE_THRESHOLD': 2.0,  # mean abs luma diff below which detection is skipped
+    'TRACK_IOU_THRESHOLD': 0.5,  # box overlap above which a cached encoding is reused
+    'TRACK_TTL_FRAMES': 15,  # frames a face track survives without a match
+    'YUNET_MODEL_PATH': 'face_detection_yunet_2023mar.onnx',  # DNN detector weights
+    'USE_OPENCL': True,  # route cv2 resize/cvtColor through UMat when OpenCL exists
+    'DETECT_PYRAMID': True,  # detect at 0.125x and remap boxes to the 0.25x level
+    'SECRET_KEY': 'your_secret_key_here'
+})
+
+# Logging
+handler = RotatingFileHandler('app.log', maxBytes=5*1024*1024, backupCount=2)
+handler.setLevel(logging.INFO)
+formatter = logging.Formatter('%(asctime)s [%(levelname)s] %(message)s')
+handler.setFormatter(formatter)
+app.logger.addHandler(handler)
+app.logger.setLevel(logging.INFO)
+
+# Global variables
+processing_lock = threading.Lock()
+last_cache_clear = datetime.now()
+
+# Double buffer for the latest captured frame. The writer fills the back
+# buffer outside the lock (no 6 MB memcpy while holding it) and only the
+# index flip happens under processing_lock; readers grab the front buffer.
+_frame_buffers = [None, None]
+_latest_buf = 0
+
+
+def _publish_frame(frame):
+    """Copy frame into the back buffer and flip it to front."""
+    global _latest_buf
+    back = 1 - _latest_buf
+    buf = _frame_buffers[back]
+    if buf is None or buf.shape != frame.shape:
+        # Allocate both buffers together (first frame or camera mode change)
+        # so later flips are pure memcpy with no allocator traffic
+        _frame_buffers[0] = np.empty_like(frame)
+        _frame_buffers[1] = np.empty_like(frame)
+        buf = _frame_buffers[back]
+    np.copyto(buf, frame)
+    with processing_lock:
+        _latest_buf = back
+
+
+def _latest_frame():
+    """Return the most recently published frame buffer, or None."""
+    with processing_lock:
+        return _frame_buffers[_latest_buf]
+
+# Ensure excel files exist
+excel_manager.init_excel_files()
+
+# Bitmask of user_ids marked today: bit uid is set once attendance is
+# recorded. user_ids are small SQLite rowids, so a Python int works as a
+# dense bitset - one bit per user, no per-check hashing like a set.
+marked_today_bits = 0
+last_marked_date = date.today()
+
+# Database connection helpers (reuse your FaceDatabase wrapper)
+# One FaceDatabase per thread, shared with attendance_system through
+# database.get_database(). Schema creation/migration runs once inside
+# FaceDatabase.__init__, so handlers no longer pay the CREATE IF NOT
+# EXISTS round-trips per request.
+def get_db():
+    return get_database()
+
+# Caching known faces with LRU. The tuple deliberately carries the derived
+# artifacts (int8 matrix, scales, squared norms) so they are computed once
+# per cache fill, never per frame - K is immutable between cache clears.
+@lru_cache(maxsize=1)
+def get_cached_known_faces():
+    app.logger.info("Loading known faces (sidecar or database)")
+    K, names, user_ids = load_known_faces()
+    # K arrives as an (N,128) float32 matrix (possibly mmap'd); precompute
+    # squared row norms so matching is a single BLAS matmul instead of a
+    # per-face face_distance() call.
+    K = np.ascontiguousarray(K, dtype=np.float32)
+    # einsum computes the squared row norms without the K*K temporary
+    knorm2 = np.einsum('ij,ij->i', K, K) if K.shape[0] else np.empty(0, dtype=np.float32)
+    # Int8-quantize the matrix (per-row scale) so the matmul runs on 8-bit
+    # integers - half the memory traffic of float32. At the 0.55 tolerance
+    # the ~1% quantization error is far below the decision margin.
+    K_q, kscale = _quantize_rows(K)
+    return K, K_q, kscale, knorm2, names, user_ids
+
+
+def _quantize_rows(M):
+    """Symmetric per-row int8 quantization. Returns (M_q, scale) with
+    M ~= M_q / scale. Used for both the cached known-face matrix and the
+    per-frame probe batch, so the integer matmul sees matching scales."""
+    maxabs = np.abs(M).max(axis=1) if M.shape[0] else np.empty(0, dtype=np.float32)
+    scale = np.where(maxabs > 0, 127.0 / np.maximum(maxabs, 1e-12), 1.0).astype(np.float32)
+    M_q = np.round(M * scale[:, None]).astype(np.int8)
+    return M_q, scale
+
+
+def fast_json(data, status=200):
+    """jsonify-compatible response built with orjson when available."""
+    if orjson is not None:
+        return Response(orjson.dumps(data), status=status, mimetype='application/json')
+    resp = jsonify(data)
+    resp.status_code = status
+    return resp
+
+
+def encode_jpeg(frame, quality=70):
+    """Encode a BGR frame to JPEG bytes via the persistent TurboJPEG handle
+    when available, falling back to cv2.imencode."""
+    if _turbo_jpeg is not None:
+        return _turbo_jpeg.encode(frame, quality=quality, pixel_format=TJPF_BGR)
+    ret, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return buffer.tobytes()
+
+
+_opencl_enabled = None
+
+
+def _use_opencl():
+    """True when the config allows OpenCL and this cv2 build has a device."""
+    global _opencl_enabled
+    if _opencl_enabled is None:
+        try:
+            _opencl_enabled = bool(app.config['USE_OPENCL']) and cv2.ocl.haveOpenCL()
+        except Exception:
+            _opencl_enabled = False
+    return _opencl_enabled
+
+
+def downscale_rgb(frame, out=None):
+    """
+    0.25x downscale + BGR->RGB for the detector in one memory pass
+    (one read + one write of the quarter-size buffer, vs two full
+    traversals for separate resize and cvtColor calls).
+    The scale factor is an exact 4:1, so plain strided decimation
+    (frame[::4, ::4]) replaces the bilinear resize; reversing the channel
+    axis in the same slice fuses the cvtColor traversal into the copy.
+    On the cv2.resize fallback path the full frame is wrapped in a UMat so
+    resize+cvtColor run on the iGPU (OpenCL transparent API) and only the
+    small RGB result is downloaded for dlib.
+    Pass a preallocated `out` buffer to skip the per-frame allocation.
+    """
+    if app.config['STRIDED_DOWNSCALE']:
+        decimated = frame[::4, ::4, ::-1]
+        if out is not None and out.shape == decimated.shape:
+            np.copyto(out, decimated)
+            return out
+        return np.ascontiguousarray(decimated)
+    src = cv2.UMat(frame) if _use_opencl() else frame
+    small = cv2.resize(src, (0, 0), fx=0.25, fy=0.25, interpolation=cv2.INTER_NEAREST)
+    rgb = cv2.cvtColor(small, cv2.COLOR_BGR2RGB)
+    if isinstance(rgb, cv2.UMat):
+        rgb = rgb.get()
+    if out is not None and out.shape == rgb.shape:
+        np.copyto(out, rgb)
+        return out
+    return rgb
+
+
+# Lazily constructed YuNet detector (OpenCV DNN backend: AVX2/OpenVINO/CUDA).
+# Stays None and we keep dlib's HOG if the model file or API is missing.
+_yunet = None
+_yunet_unavailable = False
+# The detector is stateful (setInputSize, then detect). The detect worker
+# and /mark_attendance call it concurrently at different scales, so each
+# set-size/detect pair must be atomic or one caller detects with the
+# other's input size.
+_yunet_lock = threading.Lock()
+
+
+def _get_yunet():
+    global _yunet, _yunet_unavailable
+    if _yunet is not None or _yunet_unavailable:
+        return _yunet
+    model_path = app.config['YUNET_MODEL_PATH']
+    try:
+        if hasattr(cv2, 'FaceDetectorYN') and os.path.exists(model_path):
+            _yunet = cv2.FaceDetectorYN.create(model_path, '', (0, 0), 0.6, 0.3, 5000)
+            app.logger.info(f"Using YuNet face detector ({model_path})")
+        else:
+            _yunet_unavailable = True
+    except Exception as e:
+        app.logger.warning(f"YuNet unavailable, falling back to HOG: {e}")
+        _yunet_unavailable = True
+    return _yunet
+
+
+def detect_locations(rgb_small):
+    """Face detection tuned for the realtime loop. Prefers OpenCV's YuNet
+    DNN detector (3-5x faster than dlib's sequential HOG at this scale);
+    falls back to HOG with no pyramid upsample (faces are close to the
+    camera)."""
+    detector = _get_yunet()
+    if detector is not None:
+        bgr = np.ascontiguousarray(rgb_small[:, :, ::-1])
+        h, w = bgr.shape[:2]
+        with _yunet_lock:
+            detector.setInputSize((w, h))
+            faces = detector.detect(bgr)[1]
+        if faces is None:
+            return []
+        locations = []
+        for x, y, fw, fh in faces[:, :4]:
+            left = max(int(x), 0)
+            top = max(int(y), 0)
+            right = min(int(x + fw), w)
+            bottom = min(int(y + fh), h)
+            locations.append((top, right, bottom, left))
+        return locations
+    if dlib is not None:
+        # Direct dlib call: skips the wrapper's rect conversion round-trip
+        h, w = rgb_small.shape[:2]
+        rects = _dlib_detector(rgb_small, 0)
+        return [(max(r.top(), 0), min(r.right(), w), min(r.bottom(), h), max(r.left(), 0))
+                for r in rects]
+    return face_recognition.face_locations(
+        rgb_small, number_of_times_to_upsample=0, model='hog')
+
+
+def encode_locations(rgb_small, face_locations):
+    """Encode the given boxes with no jitter resampling and the 5-point
+    'small' landmark model - ~3x faster than 'large' and accurate enough
+    at our matching tolerance. With two or more faces the descriptors are
+    computed in one batched dlib forward pass (amortizes model setup and,
+    on CUDA builds, runs as a single batched matmul). The dlib singletons
+    are called directly - no per-call wrapper conversions."""
+    if dlib is not None and len(face_locations) >= 1:
+        try:
+            shapes = dlib.full_object_detections()
+            for (top, right, bottom, left) in face_locations:
+                rect = dlib.rectangle(left, top, right, bottom)
+                shapes.append(_dlib_pose_predictor(rgb_small, rect))
+            raw = _dlib_face_encoder.compute_face_descriptor(rgb_small, shapes, 0)
+            # float32 on receipt: all downstream math runs at 4 bytes/lane
+            return [np.array(d, dtype=np.float32) for d in raw]
+        except Exception as e:
+            app.logger.warning(f"Batched descriptor path failed, using sequential: {e}")
+    return [enc.astype(np.float32, copy=False) for enc in
+            face_recognition.face_encodings(rgb_small, face_locations, num_jitters=0, model='small')]
+
+
+def detect_faces(rgb_small):
+    """Detection + encoding in one call (used where tracking doesn't apply).
+    Both the video loop and /mark_attendance funnel through
+    encode_locations, so every frame's faces hit the encoder as one
+    batched compute_face_descriptor call."""
+    face_locations = detect_locations(rgb_small)
+    return face_locations, encode_locations(rgb_small, face_locations)
+
+
+def match_faces(face_encodings):
+    """
+    Match probe encodings against all cached known faces in one shot.
+    Returns (best_idx, best_d2) arrays - nearest index and *squared* L2
+    distance per probe - or (None, None) when there is nothing to match.
+    Callers threshold against FACE_TOLERANCE**2 and only take the sqrt
+    for the faces that actually matched (display confidence).
+    d(E,K)^2 = ||E||^2 + ||K||^2 - 2 E.K  -> one matmul for all pairs.
+    """
+    K, K_q, kscale, knorm2, _, _ = get_cached_known_faces()
+    if K.shape[0] == 0 or not face_encodings:
+        return None, None
+    E = np.ascontiguousarray(face_encodings, dtype=np.float32)
+    if match.batch_best is not None:
+        # Fused numba kernel: one pass over K, no distance-matrix temporary
+        best_idx, best_d2 = match.batch_best(K, E)
+    else:
+        E_q, escale = _quantize_rows(E)
+        # Integer dot products, dequantized back to float with the row scales
+        dot = E_q.astype(np.int32) @ K_q.T.astype(np.int32)
+        dot = dot.astype(np.float32) / (escale[:, None] * kscale[None, :])
+        d2 = knorm2[None, :] + np.einsum('ij,ij->i', E, E)[:, None] - 2.0 * dot
+        best_idx = d2.argmin(axis=1)
+        best_d2 = d2[np.arange(len(E)), best_idx]
+    return best_idx, np.maximum(best_d2, 0.0)
+
+def clear_face_cache():
+    global last_cache_clear
+    now = datetime.now()
+    if now - last_cache_clear > timedelta(minutes=app.config['CACHE_TIMEOUT_MINUTES']):
+        get_cached_known_faces.cache_clear()
+        last_cache_clear = now
+        app.logger.info("Cleared face recognition cache")
+
+
+
+# Video pipeline: capture thread -> detect thread -> JPEG thread -> generator.
+# Bounded queues give back-pressure: the reader drops frames when the
+# detector falls behind, so the stream shows the freshest frame instead of
+# building latency, and JPEG encode of frame N overlaps detection of N+1.
+# EMA of the detect/encode stage wall time, written by the detect worker and
+# read by the capture worker to adapt how many frames it forwards
+_proc_ema_ms = 0.0
+
+
+def _effective_skip():
+    """Skip rate that keeps the detector at full duty without queue buildup:
+    forward roughly one frame per measured processing interval."""
+    if _proc_ema_ms <= 0.0:
+        return app.config['FRAME_SKIP_RATE']
+    target_frame_ms = 1000.0 / app.config['CAMERA_FPS']
+    return max(1, int(_proc_ema_ms / target_frame_ms))
+
+
+def _capture_worker(cap, read_q, stop_event):
+    """Capture stage: pull frames from the camera, drop when the queue is full."""
+    frame_counter = 0
+    while not stop_event.is_set():
+        success, frame = cap.read()
+        if not success:
+            app.logger.warning("Frame capture failed")
+            break
+        frame_counter += 1
+        # Adaptive frame skipping
+        if frame_counter % _effective_skip() != 0:
+            continue
+        try:
+            read_q.put_nowait((frame_counter, frame))
+        except queue.Full:
+            # Drop-oldest: evict the stale frame so the detector always
+            # picks up the freshest capture rather than queued latency
+            try:
+                read_q.get_nowait()
+            except queue.Empty:
+                pass
+            try:
+                read_q.put_nowait((frame_counter, frame))
+            except queue.Full:
+                pass
+    stop_event.set()
+
+
+# Reusable RGB scratch buffer for the detect stage (that thread only)
+_rgb_small_buf = None
+# Motion gate state: previous downscaled luma plane + last detection results
+_prev_gray = None
+_last_detections = ([], [])
+# Face tracks: boxes seen in recent frames with their cached encodings, so a
+# face that hasn't moved (IoU overlap with its old box) skips the ResNet
+_tracked_faces = []  # [{'box': (t,r,b,l), 'enc': ndarray, 'ttl': int}]
+
+
+def _iou_against(box, boxes):
+    """IoU of one (top,right,bottom,left) box against an (N,4) array of them."""
+    t, r, b, l = box
+    inter_w = np.clip(np.minimum(r, boxes[:, 1]) - np.maximum(l, boxes[:, 3]), 0, None)
+    inter_h = np.clip(np.minimum(b, boxes[:, 2]) - np.maximum(t, boxes[:, 0]), 0, None)
+    inter = inter_w * inter_h
+    area = (r - l) * (b - t)
+    areas = (boxes[:, 1] - boxes[:, 3]) * (boxes[:, 2] - boxes[:, 0])
+    return inter / np.maximum(area + areas - inter, 1e-9)
+
+
+def _encodings_with_tracking(rgb_small, face_locations):
+    """
+    Return encodings for face_locations, reusing cached encodings for boxes
+    that overlap a recent track (IoU above threshold). Only genuinely new
+    boxes go through the encoder.
+    """
+    global _tracked_faces
+    encodings = [None] * len(face_locations)
+    iou_thr = app.config['TRACK_IOU_THRESHOLD']
+    ttl = app.config['TRACK_TTL_FRAMES']
+
+    if _tracked_faces:
+        tboxes = np.asarray([tr['box'] for tr in _tracked_faces], dtype=np.float32)
+        for i, loc in enumerate(face_locations):
+            ious = _iou_against(loc, tboxes)
+            j = int(ious.argmax())
+            if float(ious[j]) > iou_thr:
+                track = _tracked_faces[j]
+                track['box'] = loc
+                track['ttl'] = ttl
+                encodings[i] = track['enc']
+
+    unmatched = [loc for i, loc in enumerate(face_locations) if encodings[i] is None]
+    if unmatched:
+        fresh = iter(encode_locations(rgb_small, unmatched))
+        for i, loc in enumerate(face_locations):
+            if encodings[i] is None:
+                enc = next(fresh)
+                encodings[i] = enc
+                _tracked_faces.append({'box': loc, 'enc': enc, 'ttl': ttl})
+
+    # Age out tracks that stopped matching
+    for tr in _tracked_faces:
+        tr['ttl'] -= 1
+    _tracked_faces = [tr for tr in _tracked_faces if tr['ttl'] > 0]
+    return encodings
+
+
+def _process_frame(frame):
+    """Detect/recognize/annotate one frame, returning the annotated frame."""
+    global _rgb_small_buf, _prev_gray, _last_detections
+
+    # Publish the raw frame for /mark_attendance (lock only guards the flip)
+    _publish_frame(frame)
+
+    # Resize for faster face processing (fused decimation + BGR->RGB),
+    # reusing one preallocated buffer across frames
+    rgb_small = downscale_rgb(frame, out=_rgb_small_buf)
+    _rgb_small_buf = rgb_small
+
+    # Motion gate: on a static scene (tiny SAD against the previous luma
+    # plane) reuse the last detections instead of running dlib. absdiff is
+    # one SIMD pass over a small uint8 buffer - microseconds vs ~100 ms.
+    gray = cv2.cvtColor(rgb_small, cv2.COLOR_RGB2GRAY)
+    scene_static = (
+        _prev_gray is not None
+        and gray.shape == _prev_gray.shape
+        and int(cv2.absdiff(gray, _prev_gray).sum())
+            < app.config['MOTION_GATE_THRESHOLD'] * gray.size
+    )
+    _prev_gray = gray
+
+    if scene_static:
+        face_locations, face_encodings = _last_detections
+    else:
+        # Detect on a further-halved pyramid level (0.125x of the camera
+        # frame, 4x fewer pixels for the detector), then remap the boxes
+        # into rgb_small coordinates for the landmark/encoder stage
+        if app.config['DETECT_PYRAMID']:
+            detect_img = np.ascontiguousarray(rgb_small[::2, ::2])
+            h, w = rgb_small.shape[:2]
+            face_locations = [
+                (t * 2, min(r * 2, w), min(b * 2, h), l * 2)
+                for (t, r, b, l) in detect_locations(detect_img)
+            ]
+        else:
+            face_locations = detect_locations(rgb_small)
+        # Encode only boxes the tracker hasn't seen recently
+        face_encodings = _encodings_with_tracking(rgb_small, face_locations)
+        _last_detections = (face_locations, face_encodings)
+
+    # Lock guards recognition + marked-today bookkeeping
+    global marked_today_bits
+    with processing_lock:
+        _, _, _, _, known_names, user_ids = get_cached_known_faces()
+
+        # One vectorized distance computation for every face in the frame;
+        # threshold on squared distance, sqrt only for matched faces
+        tol2 = app.config['FACE_TOLERANCE'] ** 2
+        best_idxs, best_d2s = match_faces(face_encodings)
+        if best_idxs is not None:
+            matches_to_mark = []
+            for (top, right, bottom, left), best_idx, best_d2 in zip(face_locations, best_idxs, best_d2s):
+                best_idx = int(best_idx)
+                is_match = float(best_d2) < tol2
+                name_to_show = "Unknown"
+                color = (0, 0, 255)
+                if is_match:
+                    # ✅ Recognized (native scalars out of the SoA arrays)
+                    uid = int(user_ids[best_idx])
+                    name = str(known_names[best_idx])
+                    name_to_show = f"{name} ({1.0 - float(np.sqrt(best_d2)):.2f})"
+                    color = (0, 255, 0)
+
+                    # 🤖 Auto-mark attendance if not already marked
+                    if not (marked_today_bits >> uid) & 1:
+                        matches_to_mark.append((uid, name))
+
+                # scale back to full frame and draw
+                top *= 4; right *= 4; bottom *= 4; left *= 4
+                cv2.rectangle(frame, (left, top), (right, bottom), color, 2)
+                cv2.putText(frame, name_to_show, (left+6, bottom-6),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255,255,255), 1)
+            if matches_to_mark:
+                app.logger.info(f"🤖 Auto marking attendance for {len(matches_to_mark)} face(s): {matches_to_mark}")
+                mark_attendance_batch(matches_to_mark)
+                for uid, _ in matches_to_mark:
+                    marked_today_bits |= 1 << uid
+
+    return frame
+
+
+def _detect_worker(read_q, encode_q, stop_event):
+    """Detect stage: heavy dlib work, feeding annotated frames downstream."""
+    global _proc_ema_ms
+    while not stop_event.is_set():
+        reset_marked_today_if_new_day()  # 🧹 Reset daily marked cache
+        try:
+            _, frame = read_q.get(timeout=0.5)
+        except queue.Empty:
+            continue
+        try:
+            t0 = time.perf_counter()
+            annotated = _process_frame(frame)
+            elapsed_ms = (time.perf_counter() - t0) * 1000.0
+            # EMA feeds the capture worker's adaptive skip rate
+            _proc_ema_ms = elapsed_ms if _proc_ema_ms == 0.0 else 0.9 * _proc_ema_ms + 0.1 * elapsed_ms
+        except Exception as e:
+            app.logger.error(f"Frame processing failed: {str(e)}")
+            continue
+        try:
+            encode_q.put_nowait(annotated)
+        except queue.Full:
+            pass  # encoder busy - drop, keep freshest
+
+
+def _encode_worker(encode_q, out_q, stop_event):
+    """JPEG stage on its own thread: turbojpeg/libjpeg release the GIL, so
+    encoding frame N overlaps detection of frame N+1."""
+    while not stop_event.is_set():
+        try:
+            annotated = encode_q.get(timeout=0.5)
+        except queue.Empty:
+            continue
+        try:
+            frame_bytes = encode_jpeg(annotated, quality=70)
+        except Exception as e:
+            app.logger.error(f"JPEG encode failed: {str(e)}")
+            continue
+        try:
+            out_q.put_nowait(frame_bytes)
+        except queue.Full:
+            pass  # client slower than the pipeline - drop, keep freshest
+    stop_event.set()
+
+
+# Preformatted multipart header template - only the length is filled per frame
+_MJPEG_PART_HEADER = (b'--frame\r\n'
+                      b'Content-Type: image/jpeg\r\n'
+                      b'Content-Length: %d\r\n\r\n')
+
+
+# Video feed generator (yields MJPEG)
+def generate_frames():
+    try:
+        cap = cv2.VideoCapture(app.config['VIDEO_SOURCE'],cv2.CAP_DSHOW)
+        if not cap.isOpened():
+            raise RuntimeError("Could not open camera")
+    except Exception as e:
+        app.logger.error(f"Camera initialization failed: {str(e)}")
+        return
+
+    read_q = queue.Queue(maxsize=2)
+    encode_q = queue.Queue(maxsize=2)
+    out_q = queue.Queue(maxsize=2)
+    stop_event = threading.Event()
+    workers = [
+        threading.Thread(target=_capture_worker, args=(cap, read_q, stop_event), daemon=True),
+        threading.Thread(target=_detect_worker, args=(read_q, encode_q, stop_event), daemon=True),
+        threading.Thread(target=_encode_worker, args=(encode_q, out_q, stop_event), daemon=True),
+    ]
+    for w in workers:
+        w.start()
+
+    try:
+        while not stop_event.is_set():
+            try:
+                frame_bytes = out_q.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            # Yield header/payload/trailer separately: no per-frame bytes
+            # concatenation (one frame-sized malloc+copy saved), and the
+            # Content-Length keeps browsers from buffering heuristically
+            yield _MJPEG_PART_HEADER % len(frame_bytes)
+            yield frame_bytes
+            yield b'\r\n'
+    finally:
+        stop_event.set()
+        for w in workers:
+            w.join(timeout=2.0)
+        try:
+            cap.release()
+        except Exception:
+            pass
+        app.logger.info("Camera resource released")
+
+def reset_marked_today_if_new_day():
+    global marked_today_bits, last_marked_date
+    today = date.today()
+    if today != last_marked_date:
+        marked_today_bits = 0
+        last_marked_date = today
+        app.logger.info("🧹 Cleared marked-today bitset for new day")
+
+
+# Routes
+# ⬇️ Replace your existing index() route
+@app.route('/')
+def index():
+    return send_from_directory('static', 'index.html')
+
+
+@app.route('/video_feed')
+def video_feed():
+    clear_face_cache()
+    return Response(generate_frames(), mimetype='multipart/x-mixed-replace; boundary=frame')
+
+@app.route('/mark_attendance', methods=['POST', 'GET'])
+def mark_attendance_endpoint():
+    """
+    Accepts a request to mark attendance from the current_frame.
+    Handles multiple faces in the frame and marks all recognized employees.
+    """
+    try:
+        clear_face_cache()
+
+        current_frame = _latest_frame()
+        if current_frame is None:
+            app.logger.error("No frame available for attendance marking")
+            return fast_json({"status":"error","message":"Camera feed not available"}, status=400)
+
+        with processing_lock:
+            rgb_small = downscale_rgb(current_frame)
+            face_locations, face_encodings = detect_faces(rgb_small)
+
+            if not face_encodings:
+                app.logger.warning("No faces detected in frame")
+                return fast_json({"status":"error","message":"No face detected - please face the camera"}, status=400)
+
+            K, _, _, _, known_names, user_ids = get_cached_known_faces()
+            if K.shape[0] == 0:
+                app.logger.error("No registered faces in database")
+                return fast_json({"status":"error","message":"System has no registered users"}, status=400)
+
+            # Threshold + per-user dedup done entirely in NumPy: keep
+            # confident matches (squared-distance cutoff, no sqrt), then
+            # np.unique picks the first hit per uid
+            best_idxs, best_d2s = match_faces(face_encodings)
+            keep = best_d2s < app.config['FACE_TOLERANCE'] ** 2
+            kept_idx = best_idxs[keep]
+            kept_uids = user_ids[kept_idx]
+            kept_names = known_names[kept_idx]
+            uniq_uids, first = np.unique(kept_uids, return_index=True)
+            matches = [(int(u), str(n)) for u, n in zip(uniq_uids, kept_names[first])]
+
+            if not matches:
+                return fast_json({"status":"error","message":"Recognition confidence too low for all faces"}, status=400)
+
+            # Mark attendance for all matched users (returns dict)
+            results = mark_attendance_batch(matches)
+            response = {"status":"success","results":[]}
+            for uid, name in matches:
+                response["results"].append({
+                    "user_id": uid,
+                    "name": name,
+                    "result": results.get(uid, "error")
+                })
+
+            # Queue the absent CSV refresh for the background writer and
+            # report the most recently generated file
+            excel_manager.request_absentees_refresh()
+            last_csv = excel_manager.last_absentees_csv()
+            if last_csv:
+                response["absentees_csv"] = last_csv
+
+            return fast_json(response)
+
+    except Exception as e:
+        app.logger.error(f"Unexpected error: {str(e)}")
+        return fast_json({"status":"error","message":"Internal server error"}, status=500)
+
+# ⬇️ Update register() to serve register.html on GET
+@app.route('/register', methods=['GET', 'POST'])
+def register():
+    if request.method == 'POST':
+        try:
+            name = request.form['name']
+            email = request.form.get('email')
+            salary = request.form.get('salary')  # optional
+            proxy = request.form.get('proxy')    # optional
+
+            if 'image' not in request.files:
+                return "No image uploaded", 400
+            image = request.files['image']
+            if image.filename == '':
+                return "No selected image", 400
+
+            # Extract face encoding. cv2.imdecode (SIMD libjpeg-turbo) gives
+            # one contiguous ndarray straight from the upload bytes, without
+            # the PIL object graph that load_image_file builds.
+            arr = np.frombuffer(image.read(), np.uint8)
+            img = cv2.imdecode(arr, cv2.IMREAD_COLOR)
+            if img is None:
+                return "Invalid image file", 400
+            img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+            encodings = face_recognition.face_encodings(img)
+            if not encodings:
+                return "No face found in image", 400
+
+            # Save to DB + Excel
+            db = get_db()
+            user_id = db.add_user(name, email, proxy=proxy, salary=salary)
+            db.add_face_encoding(user_id, encodings[0])
+            append_known_face(user_id, name, encodings[0])
+            excel_manager.add_or_update_employee(user_id, name, email=email, proxy=proxy, salary=salary)
+
+            # Clear face + users caches for immediate visibility
+            get_cached_known_faces.cache_clear()
+            _invalidate_users_cache()
+
+            return fast_json({"status": "success", "user_id": user_id})
+
+        except Exception as e:
+            app.logger.error(f"Registration failed: {e}")
+            return f"Registration failed: {str(e)}", 500
+
+    # ✅ Serve static register.html on GET
+    return send_from_directory('static', 'register.html')
+
+# ⬇️ New clean attendance page route
+@app.route('/attendance')
+def view_attendance():
+    return send_from_directory('static', 'attendance.html')
+
+# ⬇️ New clean users page route
+@app.route('/users')
+def view_users():
+    return send_from_directory('static', 'users.html')
+
+@app.route('/download_employees')
+def download_employees():
+    try:
+        return send_file('employees.xlsx', as_attachment=True)
+    except Exception as e:
+        app.logger.error(f"Failed to send employees.xlsx: {e}")
+        return "Error", 500
+
+@app.route('/download_attendance')
+def download_attendance():
+    try:
+        return send_file(excel_manager.ATTENDANCE_FILE, as_attachment=True)
+    except Exception as e:
+        app.logger.error(f"Failed to send {excel_manager.ATTENDANCE_FILE}: {e}")
+        return "Error", 500
+
+@app.route('/health')
+def health_check():
+    return fast_json({"status":"healthy", "timestamp": datetime.now().isoformat()})
+
+
+
+# The users table only changes through /register, so /api/users caches the
+# fully serialized JSON body and skips both SQLite and serialization on
+# every dashboard poll until the cache is invalidated.
+_users_cache_lock = threading.Lock()
+_users_cache_body = None
+
+
+def _invalidate_users_cache():
+    global _users_cache_body
+    with _users_cache_lock:
+        _users_cache_body = None
+
+
+@app.route('/api/users')
+def api_users():
+    global _users_cache_body
+    try:
+        with _users_cache_lock:
+            body = _users_cache_body
+        if body is None:
+            db = get_db()
+            rows = db.list_users()   # returns list of dicts directly
+            keys = ("user_id", "name", "email", "proxy", "salary")
+            users = [{k: u.get(k) for k in keys} for u in rows]
+            if orjson is not None:
+                body = orjson.dumps(users)
+            else:
+                body = json.dumps(users).encode('utf-8')
+            with _users_cache_lock:
+                _users_cache_body = body
+        return Response(body, mimetype='application/json')
+    except Exception as e:
+        app.logger.error(f"API /api/users error: {e}")
+        return fast_json([], status=500)
+
+
+
+@app.route('/api/attendance')
+def api_attendance():
+    try:
+        filter_type = request.args.get('filter_type', 'single')
+        selected_date = request.args.get('date')
+        start_date = request.args.get('start_date')
+        end_date = request.args.get('end_date')
+        # Server-side pagination: huge date ranges come back page by page
+        limit = min(max(request.args.get('limit', 500, type=int), 1), 5000)
+        offset = max(request.args.get('offset', 0, type=int), 0)
+
+        query = '''
+            SELECT u.name, a.timestamp
+            FROM attendance_records a
+            JOIN users u ON a.user_id = u.user_id
+        '''
+        params = []
+
+        # 🟢 Single date filter
+        if filter_type == 'single' and selected_date:
+            query += ' WHERE substr(a.timestamp,1,10) = ?'
+            params.append(selected_date)
+
+        # 🟡 Range filter
+        elif filter_type == 'range' and start_date and end_date:
+            query += ' WHERE substr(a.timestamp,1,10) BETWEEN ? AND ?'
+            params.extend([start_date, end_date])
+
+        query += ' ORDER BY a.timestamp DESC LIMIT ? OFFSET ?'
+        params.extend([limit, offset])
+        app.logger.info(f"Final attendance query: {query} with {params}")
+
+        # Private connection: the generator below iterates the cursor after
+        # this handler returns and closes it, so it cannot borrow from the
+        # shared pool
+        conn = get_db().open_read_conn()
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        cols = [d[0] for d in cursor.description]
+
+        def generate():
+            # Stream rows straight off the cursor - the page is never
+            # materialized as one Python list
+            try:
+                yield b'['
+                first = True
+                for r in cursor:
+                    rec = dict(zip(cols, r))
+                    ts = rec.get("timestamp")
+                    rec["timestamp"] = ts.isoformat() if hasattr(ts, 'isoformat') else str(ts)
+                    if not first:
+                        yield b','
+                    first = False
+                    if orjson is not None:
+                        yield orjson.dumps(rec)
+                    else:
+                        yield json.dumps(rec).encode('utf-8')
+                yield b']'
+            finally:
+                cursor.close()
+                conn.close()
+
+        return Response(generate(), mimetype='application/json')
+
+    except Exception as e:
+        app.logger.exception("API /api/attendance error")
+        return fast_json({"error": str(e)}, status=500)
+
+
+if __name__ == '__main__':
+    app.run(host='0.0.0.0', port=5000, debug=True, threaded=True, use_reloader=False)
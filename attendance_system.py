@@ -1,64 +1,144 @@
-# attendance_system.py
-from database import FaceDatabase
-import logging
-from datetime import datetime, date
-import excel_manager
-
-db = FaceDatabase()
-
-logging.basicConfig(filename='attendance.log', level=logging.INFO, format='%(asctime)s-%(message)s')
-
-# Ensure excel files exist at start
-excel_manager.init_excel_files()
-
-def mark_attendance(user_id, name, write_to_excel=True):
-    """
-    Record attendance for a single user. Returns:
-      True  -> newly marked
-      False -> already marked today or error
-    """
-    try:
-        today = date.today()
-        existing = db.get_attendance_report(today)  # assumes this returns rows with name in index 0 (based on your provided code)
-        present_today = any(record[0] == user_id for record in existing)
-
-        if not present_today:
-            db.record_attendance(user_id)
-            logging.info(f"Marked attendance for {name}")
-            if write_to_excel:
-                excel_manager.record_attendance_excel(user_id, name, status="present", timestamp=datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
-            return True
-        else:
-            logging.warning(f"{name} already marked today")
-            return False
-    except Exception as e:
-        logging.error(f"Error marking attendance: {str(e)}")
-        return False
-
-def mark_attendance_batch(matches, write_to_excel=True):
-    """
-    matches: list of tuples (user_id, name)
-    returns: dict with user_id -> 'marked'|'already'|'error'
-    """
-    results = {}
-    for user_id, name in matches:
-        try:
-            ok = mark_attendance(user_id, name, write_to_excel=write_to_excel)
-            results[user_id] = "marked" if ok else "already"
-        except Exception as e:
-            logging.error(f"Error marking batch attendance for {name}: {e}")
-            results[user_id] = "error"
-    # After batch marking, generate absentee list for today (CSV)
-    try:
-        excel_manager.write_daily_absentees(target_date=date.today().isoformat())
-    except Exception as e:
-        logging.error(f"Failed to write absentees list: {e}")
-    return results
-
-def load_known_faces():
-    """Load encodings from database"""
-    encodings_data = db.get_all_encodings()
-    encodings = [data['encoding'] for data in encodings_data]
-    names = [data['name'] for data in encodings_data]
-    user_ids = [data['user_id'] for data in encodings_data]
-    return encodings, names, user_ids
+# attendance_system.py
+from database import get_database
+import logging
+import os
+import pickle
+import tempfile
+from datetime import datetime, date
+import numpy as np
+import excel_manager
+
+# Sidecar cache of the stacked known-faces matrix. Warm loads mmap the .npy
+# instead of re-reading every pickle blob from SQLite; the version key from
+# get_encodings_version() tells us when the DB has moved on. Because the
+# matrix is mmap'd read-only it lives in the kernel page cache: it survives
+# process restarts and is shared for free across any worker processes.
+KNOWN_FACES_NPY = "known_faces.npy"
+KNOWN_FACES_META = "known_faces_meta.pkl"
+
+logging.basicConfig(filename='attendance.log', level=logging.INFO, format='%(asctime)s-%(message)s')
+
+# Ensure excel files exist at start
+excel_manager.init_excel_files()
+
+def mark_attendance(user_id, name, write_to_excel=True):
+    """
+    Record attendance for a single user. Returns:
+      True  -> newly marked
+      False -> already marked today or error
+    """
+    results = mark_attendance_batch([(user_id, name)], write_to_excel=write_to_excel)
+    return results.get(user_id) == "marked"
+
+def mark_attendance_batch(matches, write_to_excel=True):
+    """
+    matches: list of tuples (user_id, name)
+    returns: dict with user_id -> 'marked'|'already'|'error'
+
+    One INSERT OR IGNORE transaction against the per-day unique index
+    replaces the old per-user SELECT-then-INSERT round-trips.
+    """
+    if not matches:
+        return {}
+    now = datetime.now()
+    try:
+        inserted = get_database().record_attendance_many([(user_id, now) for user_id, _ in matches])
+    except Exception as e:
+        logging.error(f"Error marking batch attendance: {e}")
+        return {user_id: "error" for user_id, _ in matches}
+
+    results = {}
+    for user_id, name in matches:
+        if inserted.get(user_id):
+            results[user_id] = "marked"
+            logging.info(f"Marked attendance for {name}")
+            if write_to_excel:
+                excel_manager.record_attendance_excel(user_id, name, status="present", timestamp=now.strftime("%Y-%m-%d %H:%M:%S"))
+        else:
+            results[user_id] = "already"
+            logging.warning(f"{name} already marked today")
+    # Absentee CSV refresh happens in the background, off this code path
+    excel_manager.request_absentees_refresh()
+    return results
+
+def _write_known_faces_sidecar(K, names, user_ids, version):
+    """Atomically write the .npy matrix + meta pickle (temp file then replace)."""
+    dir_name = os.path.dirname(os.path.abspath(KNOWN_FACES_NPY)) or "."
+    fd, tmp_npy = tempfile.mkstemp(prefix=KNOWN_FACES_NPY + ".", suffix=".tmp", dir=dir_name)
+    os.close(fd)
+    fd, tmp_meta = tempfile.mkstemp(prefix=KNOWN_FACES_META + ".", suffix=".tmp", dir=dir_name)
+    os.close(fd)
+    try:
+        with open(tmp_npy, "wb") as f:
+            np.save(f, K)
+        with open(tmp_meta, "wb") as f:
+            pickle.dump({"version": version, "names": names, "user_ids": user_ids},
+                        f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_npy, KNOWN_FACES_NPY)
+        os.replace(tmp_meta, KNOWN_FACES_META)
+    except Exception:
+        for tmp in (tmp_npy, tmp_meta):
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        raise
+
+
+def _read_known_faces_sidecar():
+    """Return (version, K, names, user_ids) from the sidecar, or None if absent/corrupt."""
+    try:
+        with open(KNOWN_FACES_META, "rb") as f:
+            meta = pickle.load(f)
+        K = np.load(KNOWN_FACES_NPY, mmap_mode="r")
+        names = np.asarray(meta["names"], dtype='<U64')
+        user_ids = np.asarray(meta["user_ids"], dtype=np.int32)
+        return meta["version"], K, names, user_ids
+    except Exception:
+        return None
+
+
+def load_known_faces():
+    """
+    Load known encodings as (K, names, user_ids) in SoA layout: K an (N,128)
+    float32 matrix, names a '<U64' array, user_ids an int32 array. Served
+    from the mmap'd sidecar when its version matches the DB; otherwise
+    rebuilt from SQLite and the sidecar rewritten.
+    """
+    db = get_database()
+    version = db.get_encodings_version()
+    cached = _read_known_faces_sidecar()
+    if cached is not None and cached[0] == version:
+        return cached[1], cached[2], cached[3]
+
+    uid_arr, name_list, K = db.get_all_encodings_matrix()
+    names = np.asarray(name_list, dtype='<U64')
+    user_ids = uid_arr.astype(np.int32)
+    K = np.ascontiguousarray(K, dtype=np.float32)
+    try:
+        _write_known_faces_sidecar(K, names, user_ids, version)
+    except Exception as e:
+        logging.error(f"Failed to write known-faces sidecar: {e}")
+    return K, names, user_ids
+
+
+def append_known_face(user_id, name, encoding):
+    """
+    Append one newly registered face to the sidecar so the next cache load
+    skips the full DB rebuild. No-op (next load rebuilds) if the sidecar is
+    missing or out of step with the DB.
+    """
+    version = get_database().get_encodings_version()
+    cached = _read_known_faces_sidecar()
+    if cached is None:
+        return
+    old_version, K, names, user_ids = cached
+    # The sidecar must be exactly one row behind the just-inserted encoding
+    if old_version[0] != version[0] - 1 or old_version[1] >= version[1]:
+        return
+    new_row = np.asarray(encoding, dtype=np.float32).reshape(1, -1)
+    K = np.vstack([np.asarray(K), new_row])
+    names = np.concatenate([names, np.asarray([name], dtype='<U64')])
+    user_ids = np.concatenate([user_ids, np.asarray([user_id], dtype=np.int32)])
+    try:
+        _write_known_faces_sidecar(K, names, user_ids, version)
+    except Exception as e:
+        logging.error(f"Failed to append to known-faces sidecar: {e}")
@@ -1,363 +1,644 @@
-"""
-database.py
-Robust SQLite-backed FaceDatabase for face-recognition attendance systems.
-
-Features:
-- Per-method DB connections (safer for threads).
-- WAL journal mode + busy timeout to improve concurrent access.
-- Tables: users, face_encodings, attendance_records (with foreign keys).
-- Encodings serialized safely (pickle with highest protocol).
-- CRUD: add/update/delete users, add multiple encodings per user.
-- Attendance recording and flexible reporting (grouped by user_id).
-- Defensive programming + logging.
-"""
-
-import sqlite3
-import pickle
-import threading
-import logging
-from datetime import datetime, date
-from typing import List, Dict, Any, Optional, Tuple
-
-logger = logging.getLogger("FaceDatabase")
-logger.setLevel(logging.INFO)
-if not logger.handlers:
-    ch = logging.StreamHandler()
-    ch.setFormatter(logging.Formatter("%(asctime)s [%(levelname)s] %(message)s"))
-    logger.addHandler(ch)
-
-
-class FaceDatabase:
-    def __init__(self, db_path: str = "face_recognition.db", busy_timeout: int = 5000):
-        """
-        :param db_path: SQLite database file path
-        :param busy_timeout: sqlite busy timeout in milliseconds
-        """
-        self.db_path = db_path
-        self._write_lock = threading.Lock()  # serialize writes for safety
-        # Ensure DB & tables exist
-        with self._get_conn() as conn:
-            conn.execute("PRAGMA journal_mode=WAL;")         # better concurrency
-            conn.execute(f"PRAGMA busy_timeout = {int(busy_timeout)};")
-            conn.execute("PRAGMA foreign_keys = ON;")
-            self._create_tables(conn)
-            self._migrate_schema(conn)
-
-    def _get_conn(self) -> sqlite3.Connection:
-        """
-        Return a new sqlite3.Connection configured for our use.
-        NOTE: each call returns a fresh connection; callers should use context manager.
-        """
-        conn = sqlite3.connect(
-            self.db_path,
-            detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES,
-            check_same_thread=False,
-            isolation_level=None,  # autocommit off, but we'll manage transactions explicitly
-        )
-        conn.row_factory = sqlite3.Row
-        return conn
-
-    def _create_tables(self, conn: sqlite3.Connection):
-        """Create tables if missing."""
-        cur = conn.cursor()
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS users (
-                user_id     INTEGER PRIMARY KEY AUTOINCREMENT,
-                name        TEXT NOT NULL,
-                email       TEXT UNIQUE,
-                proxy       TEXT,
-                salary      REAL,
-                department  TEXT,
-                created_at  TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            );
-            """
-        )
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS face_encodings (
-                encoding_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id     INTEGER NOT NULL,
-                encoding    BLOB NOT NULL,
-                created_at  TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE
-            );
-            """
-        )
-        cur.execute(
-            """
-            CREATE TABLE IF NOT EXISTS attendance_records (
-                record_id   INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id     INTEGER NOT NULL,
-                timestamp   TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE
-            );
-            """
-        )
-        # Indexes
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_users_email ON users(email);")
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_face_enc_user ON face_encodings(user_id);")
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_att_user_time ON attendance_records(user_id, timestamp);")
-        conn.commit()
-        cur.close()
-   
-
-    def _migrate_schema(self, conn: sqlite3.Connection):
-        """Add missing columns to users if DB was created with an older schema."""
-        cur = conn.cursor()
-        cur.execute("PRAGMA table_info(users);")
-        cols = {row["name"] for row in cur.fetchall()}
-
-        added = []
-
-        if "proxy" not in cols:
-            cur.execute("ALTER TABLE users ADD COLUMN proxy TEXT;")
-            added.append("proxy TEXT")
-        if "salary" not in cols:
-            cur.execute("ALTER TABLE users ADD COLUMN salary REAL;")
-            added.append("salary REAL")
-        if "department" not in cols:
-            cur.execute("ALTER TABLE users ADD COLUMN department TEXT;")
-            added.append("department TEXT")
-        if "created_at" not in cols:
-            cur.execute("ALTER TABLE users ADD COLUMN created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;")
-            added.append("created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP")
-
-        conn.commit()
-        cur.close()
-
-        if added:
-            logger.info(f"DB schema migrated: added columns -> {', '.join(added)}")
-        else:
-            logger.info("DB schema up-to-date; no columns added.")
-
-    # ---------------------------
-    # User management
-    # ---------------------------
-    def add_user(self, name: str, email: Optional[str] = None,
-                 proxy: Optional[str] = None, salary: Optional[float] = None,
-                 department: Optional[str] = None) -> int:
-        """
-        Insert a new user. Returns user_id.
-        """
-        with self._write_lock, self._get_conn() as conn:
-            cur = conn.cursor()
-            cur.execute(
-                "INSERT INTO users (name, email, proxy, salary, department) VALUES (?, ?, ?, ?, ?);",
-                (name, email, proxy, salary, department),
-            )
-            user_id = cur.lastrowid
-            conn.commit()
-            cur.close()
-            logger.info(f"Added user {name} (id={user_id})")
-            return user_id
-
-    def update_user(self, user_id: int, **fields) -> bool:
-        """
-        Update provided user fields. Usage: update_user(5, name='New Name', salary=20000)
-        Returns True if updated (rows affected > 0).
-        """
-        if not fields:
-            return False
-        valid_cols = {"name", "email", "proxy", "salary", "department"}
-        to_set = []
-        params = []
-        for k, v in fields.items():
-            if k in valid_cols:
-                to_set.append(f"{k} = ?")
-                params.append(v)
-        if not to_set:
-            return False
-        params.append(user_id)
-        query = f"UPDATE users SET {', '.join(to_set)} WHERE user_id = ?;"
-        with self._write_lock, self._get_conn() as conn:
-            cur = conn.cursor()
-            cur.execute(query, params)
-            changed = cur.rowcount
-            conn.commit()
-            cur.close()
-            logger.info(f"Updated user {user_id}: {fields}")
-            return changed > 0
-
-    def delete_user(self, user_id: int) -> bool:
-        """Delete user (encodings and attendance cascade)."""
-        with self._write_lock, self._get_conn() as conn:
-            cur = conn.cursor()
-            cur.execute("DELETE FROM users WHERE user_id = ?;", (user_id,))
-            deleted = cur.rowcount
-            conn.commit()
-            cur.close()
-            logger.info(f"Deleted user_id={user_id}")
-            return deleted > 0
-
-    def get_user(self, user_id: int) -> Optional[Dict[str, Any]]:
-        """Return user row as dict or None."""
-        with self._get_conn() as conn:
-            cur = conn.cursor()
-            cur.execute("SELECT * FROM users WHERE user_id = ?;", (user_id,))
-            row = cur.fetchone()
-            cur.close()
-            return dict(row) if row else None
-
-    def list_users(self) -> List[Dict[str, Any]]:
-        """Return list of users as dictionaries."""
-        with self._get_conn() as conn:
-            cur = conn.cursor()
-            cur.execute("SELECT * FROM users ORDER BY user_id;")
-            rows = cur.fetchall()
-            cur.close()
-            return [dict(r) for r in rows]
-
-    # ---------------------------
-    # Face encodings
-    # ---------------------------
-    def _serialize_encoding(self, encoding) -> bytes:
-        """Serialize encoding using pickle (highest protocol)."""
-        try:
-            # We expect encoding to be a list/ndarray of floats
-            return pickle.dumps(encoding, protocol=pickle.HIGHEST_PROTOCOL)
-        except Exception as e:
-            logger.exception("Failed to serialize encoding")
-            raise
-
-    def _deserialize_encoding(self, blob: bytes):
-        """Deserialize encoding blob to original object (list/np.array)."""
-        try:
-            return pickle.loads(blob)
-        except Exception as e:
-            logger.exception("Failed to deserialize encoding")
-            raise
-
-    def add_face_encoding(self, user_id: int, encoding) -> int:
-        """
-        Add one encoding for the user. Returns encoding_id.
-        Use multiple calls to add multiple encodings per user (good for multiple images).
-        """
-        blob = self._serialize_encoding(encoding)
-        with self._write_lock, self._get_conn() as conn:
-            cur = conn.cursor()
-            cur.execute(
-                "INSERT INTO face_encodings (user_id, encoding) VALUES (?, ?);",
-                (user_id, sqlite3.Binary(blob))
-            )
-            eid = cur.lastrowid
-            conn.commit()
-            cur.close()
-            logger.info(f"Stored encoding for user_id={user_id} (encoding_id={eid})")
-            return eid
-
-    def get_all_encodings(self) -> List[Dict[str, Any]]:
-        """
-        Return list of dicts:
-         [{'user_id': int, 'name': str, 'encoding': <py object>}, ...]
-        All encodings (many per user) are returned. For recognition, client can aggregate encodings.
-        """
-        with self._get_conn() as conn:
-            cur = conn.cursor()
-            cur.execute(
-                """
-                SELECT u.user_id AS user_id, u.name AS name, fe.encoding AS encoding_blob
-                FROM face_encodings fe
-                JOIN users u ON fe.user_id = u.user_id;
-                """
-            )
-            rows = cur.fetchall()
-            cur.close()
-            result = []
-            for r in rows:
-                try:
-                    enc = self._deserialize_encoding(r["encoding_blob"])
-                except Exception:
-                    continue
-                result.append({"user_id": r["user_id"], "name": r["name"], "encoding": enc})
-            return result
-
-    def delete_encodings_for_user(self, user_id: int) -> int:
-        """Delete all encodings for a user. Returns number deleted."""
-        with self._write_lock, self._get_conn() as conn:
-            cur = conn.cursor()
-            cur.execute("DELETE FROM face_encodings WHERE user_id = ?;", (user_id,))
-            deleted = cur.rowcount
-            conn.commit()
-            cur.close()
-            logger.info(f"Deleted {deleted} encodings for user_id={user_id}")
-            return deleted
-
-    # ---------------------------
-    # Attendance
-    # ---------------------------
-    def record_attendance(self, user_id: int, when: Optional[datetime] = None) -> int:
-        """
-        Insert attendance row. Returns record_id.
-        If when is provided, uses that timestamp.
-        """
-        when_val = when or datetime.now()
-        with self._write_lock, self._get_conn() as conn:
-            cur = conn.cursor()
-            cur.execute(
-                "INSERT INTO attendance_records (user_id, timestamp) VALUES (?, ?);",
-                (user_id, when_val)
-            )
-            rid = cur.lastrowid
-            conn.commit()
-            cur.close()
-            logger.info(f"Recorded attendance user_id={user_id} record_id={rid}")
-            return rid
-
-    def get_attendance_report(self, target_date: Optional[str] = None) -> List[Tuple[int, str, int]]:
-        """
-        Returns list of tuples (user_id, name, attendance_count) grouped by user.
-        If target_date is provided (YYYY-MM-DD) the method returns counts for that day only.
-        """
-        with self._get_conn() as conn:
-            cur = conn.cursor()
-            if target_date:
-                query = """
-                    SELECT u.user_id, u.name, COUNT(ar.record_id) as attendance_count
-                    FROM users u
-                    LEFT JOIN attendance_records ar ON u.user_id = ar.user_id
-                    WHERE DATE(ar.timestamp) = ?
-                    GROUP BY u.user_id, u.name
-                    ORDER BY attendance_count DESC;
-                """
-                cur.execute(query, (target_date,))
-            else:
-                query = """
-                    SELECT u.user_id, u.name, COUNT(ar.record_id) as attendance_count
-                    FROM users u
-                    LEFT JOIN attendance_records ar ON u.user_id = ar.user_id
-                    GROUP BY u.user_id, u.name
-                    ORDER BY attendance_count DESC;
-                """
-                cur.execute(query)
-            rows = cur.fetchall()
-            cur.close()
-            return [(r["user_id"], r["name"], r["attendance_count"]) for r in rows]
-
-    def get_attendance_for_date(self, target_date: str) -> List[Dict[str, Any]]:
-        """
-        Returns attendance rows for a given date YYYY-MM-DD:
-         [{'record_id':..., 'user_id':..., 'name':..., 'timestamp':...}, ...]
-        """
-        with self._get_conn() as conn:
-            cur = conn.cursor()
-            cur.execute(
-                """
-                SELECT ar.record_id, ar.user_id, u.name, ar.timestamp
-                FROM attendance_records ar
-                JOIN users u ON ar.user_id = u.user_id
-                WHERE DATE(ar.timestamp) = ?
-                ORDER BY ar.timestamp ASC;
-                """,
-                (target_date,)
-            )
-            rows = cur.fetchall()
-            cur.close()
-            return [dict(r) for r in rows]
-
-    # ---------------------------
-    # Utility
-    # ---------------------------
-    def close(self):
-        # Nothing to do because we open per-method connections, but keep for API compatibility
-        logger.info("FaceDatabase.close() called (no-op for per-call connections).")
+"""
+database.py
+Robust SQLite-backed FaceDatabase for face-recognition attendance systems.
+
+Features:
+- Pooled connections: one persistent writer plus a small pool of read-only
+  connections, so hot paths stop paying file-open/schema-parse per call.
+- WAL journal mode + busy timeout to improve concurrent access.
+- Tables: users, face_encodings, attendance_records (with foreign keys).
+- Encodings stored as packed float32 bytes (pickle read back for legacy rows).
+- CRUD: add/update/delete users, add multiple encodings per user.
+- Attendance recording and flexible reporting (grouped by user_id).
+- Defensive programming + logging.
+"""
+
+import sqlite3
+import pickle  # legacy blob fallback only; new encodings are packed float32
+import queue
+import threading
+import logging
+from contextlib import contextmanager
+from datetime import datetime, date
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger("FaceDatabase")
+logger.setLevel(logging.INFO)
+if not logger.handlers:
+    ch = logging.StreamHandler()
+    ch.setFormatter(logging.Formatter("%(asctime)s [%(levelname)s] %(message)s"))
+    logger.addHandler(ch)
+
+
+# Read-only connections kept ready per FaceDatabase instance
+READ_POOL_SIZE = 4
+
+# Hot statements as module-level constants: every call passes the identical
+# string, so the per-connection statement cache always hits and the SQL is
+# prepared once per connection instead of re-parsed per call.
+_SQL_INSERT_ATTENDANCE = "INSERT OR IGNORE INTO attendance_records (user_id, timestamp) VALUES (?, ?);"
+_SQL_INSERT_ENCODING = "INSERT INTO face_encodings (user_id, encoding, dim) VALUES (?, ?, ?);"
+
+_db_lock = threading.Lock()
+_db_instances: Dict[str, "FaceDatabase"] = {}
+
+
+def get_database(db_path: str = "face_recognition.db") -> "FaceDatabase":
+    """
+    Shared process-wide FaceDatabase accessor. app.py and attendance_system
+    both pull their instance from here; connections are pooled inside the
+    instance (check_same_thread=False), so one wrapper serves all threads.
+    """
+    db = _db_instances.get(db_path)
+    if db is None:
+        with _db_lock:
+            db = _db_instances.get(db_path)
+            if db is None:
+                db = FaceDatabase(db_path)
+                _db_instances[db_path] = db
+    return db
+
+
+class FaceDatabase:
+    def __init__(self, db_path: str = "face_recognition.db", busy_timeout: int = 5000):
+        """
+        :param db_path: SQLite database file path
+        :param busy_timeout: sqlite busy timeout in milliseconds
+        """
+        self.db_path = db_path
+        self.busy_timeout = int(busy_timeout)
+        self._write_lock = threading.Lock()  # serialize writes for safety
+        # One persistent read/write connection (all writers go through it
+        # under _write_lock) - no more file-open + schema re-parse per call.
+        self._rw_conn = self._new_conn()
+        self._create_tables(self._rw_conn)
+        self._migrate_schema(self._rw_conn)
+        # Pool of read-only connections so readers never queue behind writes
+        self._read_pool: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+        for _ in range(READ_POOL_SIZE):
+            self._read_pool.put(self._new_conn(read_only=True))
+        # In-process cache of the decoded encodings. Writers bump
+        # _enc_version under the write lock; readers serve the cached value
+        # while its version tag still matches, skipping the JOIN + decode.
+        self._enc_version = 0
+        self._enc_cache: Optional[Tuple[int, List[Dict[str, Any]]]] = None
+        self._enc_matrix_cache: Optional[Tuple[int, Tuple]] = None
+
+    def _new_conn(self, read_only: bool = False) -> sqlite3.Connection:
+        """
+        Open and configure one long-lived connection. PRAGMAs run here, once
+        per connection, instead of on every method call.
+        """
+        if read_only:
+            target = f"file:{self.db_path}?mode=ro"
+        else:
+            target = self.db_path
+        conn = sqlite3.connect(
+            target,
+            uri=read_only,
+            detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES,
+            check_same_thread=False,
+            isolation_level=None,  # autocommit off, but we'll manage transactions explicitly
+            cached_statements=256,  # hold every hot statement prepared (default 128)
+        )
+        conn.row_factory = sqlite3.Row
+        if not read_only:
+            # WAL is a property of the DB file; read-only conns inherit it
+            conn.execute("PRAGMA journal_mode=WAL;")         # better concurrency
+            # With WAL, NORMAL only fsyncs at checkpoints instead of every
+            # commit - commits stay durable at checkpoint boundaries and
+            # per-write latency drops to the WAL append
+            conn.execute("PRAGMA synchronous=NORMAL;")
+            conn.execute("PRAGMA wal_autocheckpoint=1000;")
+        conn.execute(f"PRAGMA busy_timeout = {self.busy_timeout};")
+        conn.execute("PRAGMA foreign_keys = ON;")
+        conn.execute("PRAGMA temp_store=MEMORY;")
+        conn.execute("PRAGMA cache_size=-20000;")            # 20 MB page cache
+        # Memory-map the DB file (up to 256 MB) so the encodings JOIN scan
+        # reads pages straight from the page cache, no read() syscalls
+        conn.execute("PRAGMA mmap_size=268435456;")
+        return conn
+
+    @contextmanager
+    def _read_conn(self):
+        """Borrow a read-only connection from the pool for the duration."""
+        conn = self._read_pool.get()
+        try:
+            yield conn
+        finally:
+            self._read_pool.put(conn)
+
+    def open_read_conn(self) -> sqlite3.Connection:
+        """
+        Open a dedicated read-only connection that the caller owns and must
+        close. For streaming readers that outlive a method call (e.g. HTTP
+        response generators) and therefore cannot borrow from the pool.
+        """
+        return self._new_conn(read_only=True)
+
+    @contextmanager
+    def _write_txn(self):
+        """
+        One BEGIN IMMEDIATE transaction on the shared writer connection:
+        commit on success, roll back and re-raise on failure. Without the
+        rollback a failed statement (e.g. a UNIQUE email or FK violation)
+        would leave the process-wide connection inside an open transaction,
+        and every later write would fail with 'cannot start a transaction
+        within a transaction'.
+        """
+        with self._write_lock:
+            conn = self._rw_conn
+            conn.execute("BEGIN IMMEDIATE;")
+            try:
+                yield conn
+            except Exception:
+                conn.rollback()
+                raise
+            conn.commit()
+
+    def _create_tables(self, conn: sqlite3.Connection):
+        """Create tables if missing."""
+        cur = conn.cursor()
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS users (
+                user_id     INTEGER PRIMARY KEY AUTOINCREMENT,
+                name        TEXT NOT NULL,
+                email       TEXT UNIQUE,
+                proxy       TEXT,
+                salary      REAL,
+                department  TEXT,
+                created_at  TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+            """
+        )
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS face_encodings (
+                encoding_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id     INTEGER NOT NULL,
+                encoding    BLOB NOT NULL CHECK(length(encoding) = dim * 4),
+                dim         INTEGER NOT NULL DEFAULT 128,
+                created_at  TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE
+            );
+            """
+        )
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS attendance_records (
+                record_id   INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id     INTEGER NOT NULL,
+                timestamp   TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE
+            );
+            """
+        )
+        # Indexes
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_users_email ON users(email);")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_face_enc_user ON face_encodings(user_id);")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_att_user_time ON attendance_records(user_id, timestamp);")
+        # Expression index so single-day filters seek instead of scanning;
+        # queries must use the identical substr(timestamp,1,10) expression.
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_att_date ON attendance_records(substr(timestamp,1,10));")
+        # Covering index for the ORDER BY timestamp DESC listings: rows come
+        # back already sorted with user_id in the index, no temp B-tree.
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_att_ts_uid ON attendance_records(timestamp DESC, user_id);")
+        # One attendance row per user per day, enforced by the engine so
+        # writers can INSERT OR IGNORE instead of SELECT-then-INSERT.
+        # Pre-existing DBs may hold duplicate rows; keep those working.
+        try:
+            cur.execute(
+                "CREATE UNIQUE INDEX IF NOT EXISTS uq_att_user_day "
+                "ON attendance_records(user_id, substr(timestamp,1,10));"
+            )
+        except sqlite3.IntegrityError:
+            logger.warning("uq_att_user_day not created: existing duplicate attendance rows")
+        # Exact-duplicate guard for the Excel sync path: the B-tree enforces
+        # (user_id, timestamp) uniqueness so INSERT OR IGNORE replaces any
+        # pre-SELECT existence check. Dedupe legacy rows once, on creation.
+        cur.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='index' AND name='idx_att_uid_ts';"
+        )
+        if cur.fetchone() is None:
+            cur.execute(
+                "DELETE FROM attendance_records WHERE rowid NOT IN "
+                "(SELECT MIN(rowid) FROM attendance_records GROUP BY user_id, timestamp);"
+            )
+            cur.execute(
+                "CREATE UNIQUE INDEX idx_att_uid_ts ON attendance_records(user_id, timestamp);"
+            )
+        conn.commit()
+        cur.close()
+   
+
+    def _migrate_schema(self, conn: sqlite3.Connection):
+        """Add missing columns to users if DB was created with an older schema."""
+        cur = conn.cursor()
+        cur.execute("PRAGMA table_info(users);")
+        cols = {row["name"] for row in cur.fetchall()}
+
+        added = []
+
+        if "proxy" not in cols:
+            cur.execute("ALTER TABLE users ADD COLUMN proxy TEXT;")
+            added.append("proxy TEXT")
+        if "salary" not in cols:
+            cur.execute("ALTER TABLE users ADD COLUMN salary REAL;")
+            added.append("salary REAL")
+        if "department" not in cols:
+            cur.execute("ALTER TABLE users ADD COLUMN department TEXT;")
+            added.append("department TEXT")
+        if "created_at" not in cols:
+            cur.execute("ALTER TABLE users ADD COLUMN created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;")
+            added.append("created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP")
+
+        cur.execute("PRAGMA table_info(face_encodings);")
+        enc_cols = {row["name"] for row in cur.fetchall()}
+        if "dim" not in enc_cols:
+            cur.execute("ALTER TABLE face_encodings ADD COLUMN dim INTEGER NOT NULL DEFAULT 128;")
+            added.append("face_encodings.dim INTEGER")
+
+        # Generated day column: lets date filters hit a plain column index
+        # instead of recomputing substr() per row. Needs SQLite >= 3.31;
+        # older engines keep using the substr expression (and its index).
+        cur.execute("PRAGMA table_info(attendance_records);")
+        att_cols = {row["name"] for row in cur.fetchall()}
+        if "date" not in att_cols:
+            try:
+                cur.execute(
+                    "ALTER TABLE attendance_records ADD COLUMN date TEXT "
+                    "GENERATED ALWAYS AS (substr(timestamp,1,10)) VIRTUAL;"
+                )
+                att_cols.add("date")
+                added.append("attendance_records.date (generated)")
+            except sqlite3.OperationalError:
+                logger.warning("SQLite too old for generated columns; date filters stay on substr()")
+        self._has_date_col = "date" in att_cols
+        if self._has_date_col:
+            cur.execute(
+                "CREATE INDEX IF NOT EXISTS idx_att_date_uid ON attendance_records(date, user_id);"
+            )
+
+        conn.commit()
+        cur.close()
+
+        if added:
+            logger.info(f"DB schema migrated: added columns -> {', '.join(added)}")
+        else:
+            logger.info("DB schema up-to-date; no columns added.")
+
+    def _date_expr(self, alias: str = "") -> str:
+        """Day-filter expression for queries; alias prefixes columns (e.g. 'ar.')."""
+        if self._has_date_col:
+            return f"{alias}date"
+        return f"substr({alias}timestamp,1,10)"
+
+    # ---------------------------
+    # User management
+    # ---------------------------
+    def add_user(self, name: str, email: Optional[str] = None,
+                 proxy: Optional[str] = None, salary: Optional[float] = None,
+                 department: Optional[str] = None) -> int:
+        """
+        Insert a new user. Returns user_id.
+        """
+        with self._write_txn() as conn:
+            user_id = conn.execute(
+                "INSERT INTO users (name, email, proxy, salary, department) VALUES (?, ?, ?, ?, ?);",
+                (name, email, proxy, salary, department),
+            ).lastrowid
+            logger.info(f"Added user {name} (id={user_id})")
+            return user_id
+
+    def update_user(self, user_id: int, **fields) -> bool:
+        """
+        Update provided user fields. Usage: update_user(5, name='New Name', salary=20000)
+        Returns True if updated (rows affected > 0).
+        """
+        if not fields:
+            return False
+        valid_cols = {"name", "email", "proxy", "salary", "department"}
+        to_set = []
+        params = []
+        for k, v in fields.items():
+            if k in valid_cols:
+                to_set.append(f"{k} = ?")
+                params.append(v)
+        if not to_set:
+            return False
+        params.append(user_id)
+        query = f"UPDATE users SET {', '.join(to_set)} WHERE user_id = ?;"
+        with self._write_txn() as conn:
+            changed = conn.execute(query, params).rowcount
+            logger.info(f"Updated user {user_id}: {fields}")
+            return changed > 0
+
+    def delete_user(self, user_id: int) -> bool:
+        """Delete user (encodings and attendance cascade)."""
+        with self._write_txn() as conn:
+            deleted = conn.execute("DELETE FROM users WHERE user_id = ?;", (user_id,)).rowcount
+            self._enc_version += 1  # cascade may have removed encodings
+            logger.info(f"Deleted user_id={user_id}")
+            return deleted > 0
+
+    def get_user(self, user_id: int) -> Optional[Dict[str, Any]]:
+        """Return user row as dict or None."""
+        with self._read_conn() as conn:
+            row = conn.execute("SELECT * FROM users WHERE user_id = ?;", (user_id,)).fetchone()
+            return dict(row) if row else None
+
+    def list_users(self) -> List[Dict[str, Any]]:
+        """Return list of users as dictionaries."""
+        with self._read_conn() as conn:
+            rows = conn.execute("SELECT * FROM users ORDER BY user_id;").fetchall()
+            return [dict(r) for r in rows]
+
+    # ---------------------------
+    # Face encodings
+    # ---------------------------
+    def _deserialize_encoding(self, blob: bytes, dim: int = 128):
+        """
+        Decode an encoding blob. Packed float32 rows are exactly dim * 4
+        bytes; any other length is a legacy pickled row. (The pickle magic
+        byte is no discriminator - 1 in 256 packed vectors starts with 0x80.)
+        """
+        try:
+            if len(blob) == dim * 4:
+                return np.frombuffer(blob, dtype=np.float32)
+            return pickle.loads(blob)
+        except Exception as e:
+            logger.exception("Failed to deserialize encoding")
+            raise
+
+    def add_face_encoding(self, user_id: int, encoding) -> int:
+        """
+        Add one encoding for the user. Returns encoding_id.
+        Use multiple calls to add multiple encodings per user (good for multiple images).
+        """
+        # bytes bind as BLOB natively; no sqlite3.Binary wrapper needed
+        blob = np.ascontiguousarray(encoding, dtype=np.float32).tobytes()
+        with self._write_txn() as conn:
+            eid = conn.execute(_SQL_INSERT_ENCODING, (user_id, blob, len(blob) // 4)).lastrowid
+            self._enc_version += 1
+            logger.info(f"Stored encoding for user_id={user_id} (encoding_id={eid})")
+            return eid
+
+    def add_face_encodings(self, user_id: int, encodings: List) -> List[int]:
+        """
+        Add many encodings for the user in one transaction. Returns the new
+        encoding_ids. One BEGIN IMMEDIATE + executemany amortizes the WAL
+        fsync across all rows instead of paying it per encoding.
+        """
+        if not encodings:
+            return []
+        params = []
+        for enc in encodings:
+            blob = np.ascontiguousarray(enc, dtype=np.float32).tobytes()
+            params.append((user_id, blob, len(blob) // 4))
+        with self._write_txn() as conn:
+            conn.executemany(_SQL_INSERT_ENCODING, params)
+            # Ids are sequential inside the transaction: we hold the write
+            # lock, so nothing else inserted between these rows
+            last = int(conn.execute("SELECT MAX(encoding_id) FROM face_encodings;").fetchone()[0])
+            self._enc_version += 1
+            logger.info(f"Stored {len(params)} encodings for user_id={user_id}")
+            return list(range(last - len(params) + 1, last + 1))
+
+    def get_all_encodings(self) -> List[Dict[str, Any]]:
+        """
+        Return list of dicts:
+         [{'user_id': int, 'name': str, 'encoding': <py object>}, ...]
+        All encodings (many per user) are returned. For recognition, client can aggregate encodings.
+        Served from the in-process cache while no write has bumped _enc_version.
+        """
+        cached = self._enc_cache
+        if cached is not None and cached[0] == self._enc_version:
+            return list(cached[1])  # fresh list; callers may mutate theirs
+        version = self._enc_version
+        with self._read_conn() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                """
+                SELECT u.user_id AS user_id, u.name AS name,
+                       fe.encoding AS encoding_blob, fe.dim AS dim
+                FROM face_encodings fe
+                JOIN users u ON fe.user_id = u.user_id;
+                """
+            )
+            rows = cur.fetchall()
+            cur.close()
+            result = []
+            for r in rows:
+                try:
+                    enc = self._deserialize_encoding(r["encoding_blob"], int(r["dim"] or 128))
+                except Exception:
+                    continue
+                result.append({"user_id": r["user_id"], "name": r["name"], "encoding": enc})
+            self._enc_cache = (version, result)
+            return list(result)
+
+    def get_all_encodings_matrix(self) -> Tuple[np.ndarray, List[str], np.ndarray]:
+        """
+        Return (user_ids, names, matrix): the same JOIN as get_all_encodings,
+        streamed in fetchmany batches straight into a preallocated float32
+        matrix - no full-result list or per-row object materialization.
+        Legacy pickled rows decode through the per-row fallback. Cached
+        in-process until the next write.
+        """
+        cached = self._enc_matrix_cache
+        if cached is not None and cached[0] == self._enc_version:
+            return cached[1]
+        version = self._enc_version
+        with self._read_conn() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT COUNT(*) FROM face_encodings;")
+            n = int(cur.fetchone()[0])
+            if n == 0:
+                cur.close()
+                result = (np.empty(0, dtype=np.int64), [], np.empty((0, 128), dtype=np.float32))
+                self._enc_matrix_cache = (version, result)
+                return result
+            cur.arraysize = 256
+            cur.execute(
+                """
+                SELECT u.user_id AS user_id, u.name AS name,
+                       fe.encoding AS encoding_blob, fe.dim AS dim
+                FROM face_encodings fe
+                JOIN users u ON fe.user_id = u.user_id;
+                """
+            )
+            user_ids = np.empty(n, dtype=np.int64)
+            names: List[str] = [None] * n
+            mat = None
+            i = 0
+            while True:
+                batch = cur.fetchmany()
+                if not batch:
+                    break
+                for r in batch:
+                    if i >= n:
+                        break  # rows appended since the COUNT; cache is stale anyway
+                    if mat is None:
+                        mat = np.empty((n, int(r["dim"] or 128)), dtype=np.float32)
+                    blob = r["encoding_blob"]
+                    user_ids[i] = r["user_id"]
+                    names[i] = r["name"]
+                    if len(blob) == mat.shape[1] * 4:
+                        mat[i] = np.frombuffer(blob, dtype=np.float32)
+                    else:  # legacy pickled row
+                        mat[i] = np.asarray(
+                            self._deserialize_encoding(blob, mat.shape[1]), dtype=np.float32
+                        )
+                    i += 1
+            cur.close()
+        if i < n:
+            user_ids, names, mat = user_ids[:i], names[:i], mat[:i]
+        result = (user_ids, names, mat)
+        self._enc_matrix_cache = (version, result)
+        return result
+
+    def get_encodings_version(self) -> Tuple[int, int]:
+        """
+        Lightweight (row_count, max_encoding_id) pair identifying the current
+        state of face_encodings. Cheap enough to run on every cache check.
+        """
+        with self._read_conn() as conn:
+            row = conn.execute("SELECT COUNT(*), COALESCE(MAX(encoding_id), 0) FROM face_encodings;").fetchone()
+            return int(row[0]), int(row[1])
+
+    def delete_encodings_for_user(self, user_id: int) -> int:
+        """Delete all encodings for a user. Returns number deleted."""
+        with self._write_txn() as conn:
+            deleted = conn.execute("DELETE FROM face_encodings WHERE user_id = ?;", (user_id,)).rowcount
+            self._enc_version += 1
+            logger.info(f"Deleted {deleted} encodings for user_id={user_id}")
+            return deleted
+
+    # ---------------------------
+    # Attendance
+    # ---------------------------
+    def record_attendance(self, user_id: int, when: Optional[datetime] = None) -> int:
+        """
+        Insert attendance row. Returns record_id (0 if the exact
+        (user_id, timestamp) pair already existed and was ignored).
+        If when is provided, uses that timestamp.
+        """
+        when_val = when or datetime.now()
+        with self._write_txn() as conn:
+            cur = conn.execute(_SQL_INSERT_ATTENDANCE, (user_id, when_val))
+            rid = cur.lastrowid if cur.rowcount > 0 else 0
+            logger.info(f"Recorded attendance user_id={user_id} record_id={rid}")
+            return rid
+
+    def record_attendance_many(self, entries: List[Tuple[int, datetime]]) -> Dict[int, bool]:
+        """
+        Insert attendance rows for many users in one transaction.
+        INSERT OR IGNORE against the per-day unique index replaces the old
+        SELECT-then-INSERT dance; per-row rowcount distinguishes newly
+        marked (True) from already-marked-today (False).
+        """
+        results: Dict[int, bool] = {}
+        if not entries:
+            return results
+        with self._write_txn() as conn:
+            for user_id, when_val in entries:
+                results[user_id] = conn.execute(_SQL_INSERT_ATTENDANCE, (user_id, when_val)).rowcount > 0
+            logger.info(f"Batch attendance: {sum(results.values())} new of {len(entries)}")
+            return results
+
+    def get_attendance_pairs(self, dates: List[str]) -> set:
+        """
+        Existing (user_id, timestamp-string) pairs for the given YYYY-MM-DD
+        dates, fetched in one query. Used by the Excel sync to anti-join
+        against instead of probing per row.
+        """
+        if not dates:
+            return set()
+        placeholders = ",".join("?" * len(dates))
+        with self._read_conn() as conn:
+            cur = conn.execute(
+                f"SELECT user_id, timestamp FROM attendance_records "
+                f"WHERE {self._date_expr()} IN ({placeholders});",
+                list(dates)
+            )
+            return {(int(r[0]), str(r[1])) for r in cur.fetchall()}
+
+    def record_attendance_rows(self, rows: List[Tuple[int, datetime]]) -> int:
+        """
+        Bulk-insert exact-timestamp attendance rows in one transaction.
+        Returns rows actually inserted (OR IGNORE drops duplicates).
+        """
+        if not rows:
+            return 0
+        with self._write_txn() as conn:
+            added = conn.executemany(_SQL_INSERT_ATTENDANCE, rows).rowcount
+            logger.info(f"Bulk attendance insert: {added} of {len(rows)} rows new")
+            return added
+
+    def get_attendance_report(self, target_date: Optional[str] = None) -> List[Tuple[int, str, int]]:
+        """
+        Returns list of tuples (user_id, name, attendance_count) grouped by user.
+        If target_date is provided (YYYY-MM-DD) the method returns counts for that day only.
+        """
+        with self._read_conn() as conn:
+            cur = conn.cursor()
+            if target_date:
+                query = f"""
+                    SELECT u.user_id, u.name, COUNT(ar.record_id) as attendance_count
+                    FROM users u
+                    LEFT JOIN attendance_records ar ON u.user_id = ar.user_id
+                    WHERE {self._date_expr('ar.')} = ?
+                    GROUP BY u.user_id, u.name
+                    ORDER BY attendance_count DESC;
+                """
+                cur.execute(query, (target_date,))
+            else:
+                query = """
+                    SELECT u.user_id, u.name, COUNT(ar.record_id) as attendance_count
+                    FROM users u
+                    LEFT JOIN attendance_records ar ON u.user_id = ar.user_id
+                    GROUP BY u.user_id, u.name
+                    ORDER BY attendance_count DESC;
+                """
+                cur.execute(query)
+            rows = cur.fetchall()
+            cur.close()
+            return [(r["user_id"], r["name"], r["attendance_count"]) for r in rows]
+
+    def get_attendance_for_date(self, target_date: str) -> List[Dict[str, Any]]:
+        """
+        Returns attendance rows for a given date YYYY-MM-DD:
+         [{'record_id':..., 'user_id':..., 'name':..., 'timestamp':...}, ...]
+        """
+        with self._read_conn() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                f"""
+                SELECT ar.record_id, ar.user_id, u.name, ar.timestamp
+                FROM attendance_records ar
+                JOIN users u ON ar.user_id = u.user_id
+                WHERE {self._date_expr('ar.')} = ?
+                ORDER BY ar.timestamp ASC;
+                """,
+                (target_date,)
+            )
+            rows = cur.fetchall()
+            cur.close()
+            return [dict(r) for r in rows]
+
+    # ---------------------------
+    # Utility
+    # ---------------------------
+    def close(self):
+        """Close the writer connection and drain the read pool."""
+        with self._write_lock:
+            self._rw_conn.close()
+        while True:
+            try:
+                self._read_pool.get_nowait().close()
+            except queue.Empty:
+                break
+        logger.info("FaceDatabase.close() called; pooled connections closed.")
@@ -3,18 +3,20 @@ excel_manager.py
 Excel integration for employees and attendance:
 
 - employees.xlsx: master sheet for user metadata (user_id,name,email,proxy,salary,department)
-- attendance.xlsx: chronological attendance log (date,user_id,name,status,time)
+- attendance.csv: append-only attendance log (date,user_id,name,status,time)
 - absentees_YYYY-MM-DD.csv: daily generated absence report
 - sync_db_to_excel(db): pull users from DB and overwrite employees.xlsx (safe temp-file write)
 
 Uses pandas + openpyxl. Writes to temp files and atomically replaces target to minimize corruption.
 """
 
+import csv
 import os
 import tempfile
-import shutil
+import threading
 from datetime import datetime, date
 from typing import Optional
+import openpyxl
 import pandas as pd
 import logging
 
@@ -28,15 +30,52 @@ if not logger.handlers:
 
 EXCEL_ENGINE = "openpyxl"
 
+# Rust-based xlsx reader when installed (~10x openpyxl's pure-Python XML
+# parse); writes stay on openpyxl, which calamine does not do.
+try:
+    import python_calamine  # noqa: F401
+    EXCEL_READ_ENGINE = "calamine"
+except ImportError:
+    EXCEL_READ_ENGINE = EXCEL_ENGINE
+
+# Optional parquet mirror of the employees sheet: columnar, compressed and
+# parsed in C, so the frames read repeatedly by write_daily_absentees and
+# friends skip the pure-Python xlsx XML parse. The xlsx stays canonical for
+# humans; without pyarrow everything still works off the xlsx alone.
+try:
+    import pyarrow  # noqa: F401
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
 EMPLOYEES_FILE = "employees.xlsx"
-ATTENDANCE_FILE = "attendance.xlsx"
+EMPLOYEES_PARQUET = "employees.parquet"
+ATTENDANCE_FILE = "attendance.csv"
+ATTENDANCE_COLUMNS = ["date", "user_id", "name", "status", "time"]
 SALARY_FILE = "salary.xlsx"
 ABSENTEES_FILE = "absentees.xlsx"
 
 
+def _fsync_replace(tmp_path: str, path: str):
+    """
+    Durable atomic swap: fsync the temp file, os.replace it over the target
+    (one atomic syscall, no copy+delete fallback like shutil.move), then
+    fsync the directory so the rename itself survives a crash.
+    """
+    with open(tmp_path, "rb") as f:
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    if hasattr(os, "O_DIRECTORY"):
+        dir_fd = os.open(os.path.dirname(os.path.abspath(path)) or ".", os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+
 def _safe_write_dataframe(df: pd.DataFrame, path: str):
     """
-    Write DataFrame to an Excel file atomically (write to temp and move).
+    Write DataFrame to an Excel file atomically (write to temp and replace).
     """
     dir_name = os.path.dirname(os.path.abspath(path)) or "."
     base = os.path.basename(path)
@@ -44,8 +83,7 @@ def _safe_write_dataframe(df: pd.DataFrame, path: str):
     os.close(fd)
     try:
         df.to_excel(tmp_path, index=False, engine=EXCEL_ENGINE)
-        # replace
-        shutil.move(tmp_path, path)
+        _fsync_replace(tmp_path, path)
         logger.info(f"Wrote {path} safely")
     except Exception as e:
         logger.exception(f"Failed writing Excel to {path}: {e}")
@@ -54,16 +92,47 @@ def _safe_write_dataframe(df: pd.DataFrame, path: str):
         raise
 
 
+def _read_employees() -> pd.DataFrame:
+    """
+    Employees frame, from the parquet mirror when it is at least as new as
+    the xlsx (mtime check), else from the xlsx.
+    """
+    if PARQUET_AVAILABLE and os.path.exists(EMPLOYEES_PARQUET):
+        try:
+            if os.path.getmtime(EMPLOYEES_PARQUET) >= os.path.getmtime(EMPLOYEES_FILE):
+                return pd.read_parquet(EMPLOYEES_PARQUET, engine="pyarrow")
+        except Exception:
+            logger.exception("Failed reading employees parquet; falling back to xlsx")
+    return pd.read_excel(EMPLOYEES_FILE, engine=EXCEL_READ_ENGINE)
+
+
+def _write_employees(df: pd.DataFrame):
+    """Write the employees xlsx (canonical) and refresh the parquet mirror."""
+    _safe_write_dataframe(df, EMPLOYEES_FILE)
+    if not PARQUET_AVAILABLE:
+        return
+    dir_name = os.path.dirname(os.path.abspath(EMPLOYEES_PARQUET)) or "."
+    fd, tmp_path = tempfile.mkstemp(prefix=EMPLOYEES_PARQUET + ".", suffix=".parquet", dir=dir_name)
+    os.close(fd)
+    try:
+        df.to_parquet(tmp_path, engine="pyarrow", index=False)
+        _fsync_replace(tmp_path, EMPLOYEES_PARQUET)
+    except Exception:
+        logger.exception("Failed writing employees parquet mirror")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
 def init_excel_files():
     # Employees
     if not os.path.exists(EMPLOYEES_FILE):
         df = pd.DataFrame(columns=["user_id", "name", "email", "proxy", "salary", "department", "created_at"])
         _safe_write_dataframe(df, EMPLOYEES_FILE)
 
-    # Attendance
+    # Attendance: append-only CSV log, header written once
     if not os.path.exists(ATTENDANCE_FILE):
-        df = pd.DataFrame(columns=["user_id", "name", "timestamp"])
-        _safe_write_dataframe(df, ATTENDANCE_FILE)
+        with open(ATTENDANCE_FILE, "w", newline="") as f:
+            csv.writer(f).writerow(ATTENDANCE_COLUMNS)
 
     # Salary
     if not os.path.exists(SALARY_FILE):
@@ -81,45 +150,61 @@ def add_or_update_employee(user_id: int, name: str, email: Optional[str] = None,
                            department: Optional[str] = None, created_at: Optional[str] = None):
     """
     Upsert employee row in employees.xlsx based on user_id.
+
+    Works on the sheet directly via openpyxl - mutate the matching row's
+    cells (or append one new row) - instead of round-tripping the whole
+    file through a DataFrame for a single-employee change.
     """
     init_excel_files()
-    df = pd.read_excel(EMPLOYEES_FILE, engine=EXCEL_ENGINE)
-    # ensure user_id column exists and dtype consistent
-    if "user_id" not in df.columns:
-        df["user_id"] = pd.Series(dtype=int)
-    mask = df["user_id"] == user_id
-    if mask.any():
-        idx = df.index[mask][0]
-        df.at[idx, "name"] = name
-        if email is not None: df.at[idx, "email"] = email
-        if proxy is not None: df.at[idx, "proxy"] = proxy
-        if salary is not None: df.at[idx, "salary"] = salary
-        if department is not None: df.at[idx, "department"] = department
+    wb = openpyxl.load_workbook(EMPLOYEES_FILE)
+    ws = wb.active
+    target = None
+    for row in ws.iter_rows(min_row=2):
+        if row[0].value == user_id:
+            target = row
+            break
+    if target is not None:
+        target[1].value = name
+        if email is not None: target[2].value = email
+        if proxy is not None: target[3].value = proxy
+        if salary is not None: target[4].value = salary
+        if department is not None: target[5].value = department
     else:
-        row = {
-            "user_id": user_id,
-            "name": name,
-            "email": email or "",
-            "proxy": proxy or "",
-            "salary": salary if salary is not None else "",
-            "department": department or "",
-            "created_at": created_at or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        }
-        df = pd.concat([df, pd.DataFrame([row])], ignore_index=True)
-    _safe_write_dataframe(df, EMPLOYEES_FILE)
+        ws.append([
+            user_id,
+            name,
+            email or "",
+            proxy or "",
+            salary if salary is not None else "",
+            department or "",
+            created_at or datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        ])
+    # atomic replace, same pattern as _safe_write_dataframe
+    dir_name = os.path.dirname(os.path.abspath(EMPLOYEES_FILE)) or "."
+    fd, tmp_path = tempfile.mkstemp(prefix=EMPLOYEES_FILE + ".", suffix=".xlsx", dir=dir_name)
+    os.close(fd)
+    try:
+        wb.save(tmp_path)
+        _fsync_replace(tmp_path, EMPLOYEES_FILE)
+    except Exception as e:
+        logger.exception(f"Failed writing Excel to {EMPLOYEES_FILE}: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
 
 
 def record_attendance_excel(user_id: int, name: str, status: str = "present", timestamp: Optional[str] = None):
     """
-    Append a single attendance event to attendance.xlsx
+    Append a single attendance event to attendance.csv
     status: 'present' or 'absent' or other custom status.
+
+    Attendance is naturally append-only, so each event costs one line of
+    I/O instead of the old read-whole-sheet-and-rewrite round-trip.
     """
     init_excel_files()
     timestamp = timestamp or datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    df = pd.read_excel(ATTENDANCE_FILE, engine=EXCEL_ENGINE)
-    row = {"date": timestamp.split(" ")[0], "user_id": user_id, "name": name, "status": status, "time": timestamp}
-    df = pd.concat([df, pd.DataFrame([row])], ignore_index=True)
-    _safe_write_dataframe(df, ATTENDANCE_FILE)
+    with open(ATTENDANCE_FILE, "a", newline="", buffering=8192) as f:
+        csv.writer(f).writerow([timestamp.split(" ")[0], user_id, name, status, timestamp])
 
 
 def write_daily_absentees(target_date: Optional[str] = None, output_prefix: str = "absentees_") -> str:
@@ -129,22 +214,23 @@ def write_daily_absentees(target_date: Optional[str] = None, output_prefix: str
     """
     init_excel_files()
     target_date = target_date or date.today().isoformat()
-    emp_df = pd.read_excel(EMPLOYEES_FILE, engine=EXCEL_ENGINE)
-    att_df = pd.read_excel(ATTENDANCE_FILE, engine=EXCEL_ENGINE)
+    emp_df = _read_employees()
+    # Only the three columns the present-filter touches
+    att_df = pd.read_csv(ATTENDANCE_FILE, usecols=["date", "user_id", "status"])
 
-    # Determine present ids
+    # Determine present ids, then anti-join with one vectorized isin pass -
+    # no Python sets or intermediate sorted lists
     if "date" in att_df.columns and "status" in att_df.columns:
         present_mask = (att_df["date"] == target_date) & (att_df["status"].str.lower() == "present")
-        present_ids = set(att_df.loc[present_mask, "user_id"].tolist())
+        present_ids = att_df.loc[present_mask, "user_id"]
     else:
-        present_ids = set()
+        present_ids = pd.Series([], dtype="int64")
 
-    all_ids = set(emp_df["user_id"].tolist()) if "user_id" in emp_df.columns else set()
-    absentees = sorted(list(all_ids - present_ids))
-    if not absentees:
-        out_df = pd.DataFrame(columns=["user_id", "name", "email", "proxy", "salary", "department"])
+    cols = ["user_id", "name", "email", "proxy", "salary", "department"]
+    if "user_id" in emp_df.columns:
+        out_df = emp_df.loc[~emp_df["user_id"].isin(present_ids), cols]
     else:
-        out_df = emp_df[emp_df["user_id"].isin(absentees)][["user_id", "name", "email", "proxy", "salary", "department"]]
+        out_df = pd.DataFrame(columns=cols)
 
     out_filename = f"{output_prefix}{target_date}.csv"
     out_df.to_csv(out_filename, index=False)
@@ -152,14 +238,52 @@ def write_daily_absentees(target_date: Optional[str] = None, output_prefix: str
     return out_filename
 
 
+# Debounced absentee refresh: attendance writers flip the dirty flag and a
+# single daemon thread regenerates the CSV at most once per interval, so the
+# O(users) scan + file write never runs inside a marking code path.
+_absentees_dirty = threading.Event()
+_absentees_thread = None
+_absentees_thread_lock = threading.Lock()
+_last_absentees_csv: Optional[str] = None
+ABSENTEES_DEBOUNCE_SECONDS = 5
+
+
+def _absentees_worker():
+    global _last_absentees_csv
+    while True:
+        _absentees_dirty.wait()
+        _absentees_dirty.clear()
+        try:
+            _last_absentees_csv = write_daily_absentees(target_date=date.today().isoformat())
+        except Exception:
+            logger.exception("Deferred absentees CSV write failed")
+        # Coalesce bursts of marking events into one write per interval
+        threading.Event().wait(ABSENTEES_DEBOUNCE_SECONDS)
+
+
+def request_absentees_refresh():
+    """Mark the daily absentees CSV stale; the background worker rewrites it."""
+    global _absentees_thread
+    with _absentees_thread_lock:
+        if _absentees_thread is None:
+            _absentees_thread = threading.Thread(target=_absentees_worker, daemon=True)
+            _absentees_thread.start()
+    _absentees_dirty.set()
+
+
+def last_absentees_csv() -> Optional[str]:
+    """Filename of the most recently generated absentees CSV, if any."""
+    return _last_absentees_csv
+
+
 def get_all_employees_df() -> pd.DataFrame:
     init_excel_files()
-    return pd.read_excel(EMPLOYEES_FILE, engine=EXCEL_ENGINE)
+    return _read_employees()
 
 
 def get_attendance_df() -> pd.DataFrame:
     init_excel_files()
-    return pd.read_excel(ATTENDANCE_FILE, engine=EXCEL_ENGINE)
+    return pd.read_csv(ATTENDANCE_FILE)
 
 
 def sync_db_to_excel(db):
@@ -180,13 +304,13 @@ def sync_db_to_excel(db):
             if c not in df.columns:
                 df[c] = ""
         df = df[cols]
-    _safe_write_dataframe(df, EMPLOYEES_FILE)
+    _write_employees(df)
     logger.info("Synchronized DB users to employees.xlsx")
 
 
 def sync_excel_attendance_to_db(db):
     """
-    Read attendance.xlsx and write any rows missing into DB.attendance_records.
+    Read the attendance CSV log and write any rows missing into DB.attendance_records.
     Use this if you sometimes record attendance in Excel and want to push to DB.
     WARNING: Idempotence: this implementation will check by exact timestamp and user_id to avoid duplicates.
     """
@@ -194,30 +318,33 @@ def sync_excel_attendance_to_db(db):
     if df.empty:
         return 0
 
-    added = 0
-    for _, row in df.iterrows():
+    # Anti-join: fetch existing (user_id, timestamp) pairs for the dates in
+    # the sheet once, diff in Python sets, then bulk-insert the missing rows
+    # in a single transaction - no per-row date query or linear scan.
+    dates = sorted({str(t).split(" ")[0] for t in df["time"] if pd.notna(t)})
+    existing = db.get_attendance_pairs(dates)
+
+    new_rows = []
+    for row in df.itertuples(index=False):
         try:
-            user_id = int(row["user_id"])
-            timestamp = row["time"]
-            # Check if such timestamp exists already in DB for user (simple existence check).
-            # We do a naive approach: fetch attendance for that date and check exact timestamps.
-            date_part = str(timestamp).split(" ")[0]
-            db_rows = db.get_attendance_for_date(date_part)
-            exists = any(str(r["user_id"]) == str(user_id) and str(r["timestamp"]) == str(timestamp) for r in db_rows)
-            if not exists:
-                # convert timestamp string to datetime if necessary
-                if isinstance(timestamp, str):
-                    try:
-                        ts_val = datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S")
-                    except Exception:
-                        ts_val = None
-                else:
-                    ts_val = timestamp
-                if ts_val:
-                    db.record_attendance(user_id, when=ts_val)
-                    added += 1
+            user_id = int(row.user_id)
+            timestamp = row.time
+            if (user_id, str(timestamp)) in existing:
+                continue
+            # convert timestamp string to datetime if necessary
+            if isinstance(timestamp, str):
+                try:
+                    ts_val = datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S")
+                except Exception:
+                    ts_val = None
+            else:
+                ts_val = timestamp
+            if ts_val:
+                new_rows.append((user_id, ts_val))
         except Exception:
             logger.exception("Failed to sync a row from Excel to DB; skipping.")
             continue
+
+    added = db.record_attendance_rows(new_rows)
     logger.info(f"Synced {added} attendance rows from Excel to DB")
     return added
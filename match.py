@@ -0,0 +1,49 @@
+# match.py
+# Fused nearest-neighbour kernel for face encoding matching.
+#
+# When numba is installed, the subtract/square/sum/argmin chain runs as one
+# JIT-compiled pass over the known-face matrix (LLVM auto-vectorizes the
+# 128-dim inner loop with fastmath), instead of NumPy materializing the full
+# (probes x known) distance matrix and scanning it three times. Falls back
+# to batch_best = None so app.py can keep its NumPy matmul path.
+
+import numpy as np
+
+try:
+    from numba import njit, prange
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+if NUMBA_AVAILABLE:
+    # No eager signature: an explicit f4[:, ::1] only admits writable
+    # arrays, but K is the read-only mmap'd sidecar matrix on the warm
+    # path. Lazy inference types the readonly array fine (first call per
+    # type pays the compile; cache=True persists it across runs).
+    @njit(parallel=True, fastmath=True, cache=True)
+    def batch_best(K, E):
+        """
+        For each probe row in E, find the nearest row in K.
+        Returns (best_idx, best_d2) - index and squared L2 distance.
+        """
+        m = E.shape[0]
+        n = K.shape[0]
+        dims = K.shape[1]
+        best_idx = np.empty(m, np.int32)
+        best_d2 = np.empty(m, np.float32)
+        for i in prange(m):
+            b_idx = -1
+            b_d2 = np.float32(np.inf)
+            for j in range(n):
+                acc = np.float32(0.0)
+                for d in range(dims):
+                    diff = E[i, d] - K[j, d]
+                    acc += diff * diff
+                if acc < b_d2:
+                    b_d2 = acc
+                    b_idx = j
+            best_idx[i] = b_idx
+            best_d2[i] = b_d2
+        return best_idx, best_d2
+else:
+    batch_best = None